@@ -1,128 +1,269 @@
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
+import pandas as pd
+import scipy.sparse as sp
 from sklearn.feature_selection import VarianceThreshold
-from sklearn.decomposition import PCA
-import seaborn as sns
-from yellowbrick.cluster import KElbowVisualizer
-from yellowbrick.cluster import SilhouetteVisualizer
-
-data = pd.read_csv('processed_data.csv')
-
-model = KMeans()
-visualizer = KElbowVisualizer(model, k=(1,8),timings=False)
-visualizer.fit(data)
-visualizer.show()
-
-# K-Mean
-model = KMeans(n_clusters=3,random_state=0).fit(data)
-lab = model.labels_
-S = silhouette_score(data,lab)
-
-
-visualizer = SilhouetteVisualizer(model, colors='yellowbrick')
-visualizer.fit(data)
-visualizer.show()
-
-# Config
-N_RUNS = 4
-best_score = -1
-best_run_data = None
-
-for seed in range(N_RUNS):
-    print(f"\n==== RUN {seed} ====")
-    rng = np.random.default_rng(seed)
-
-    # Load and filter data
-    data = pd.read_csv('processed_data.csv')
-    selector = VarianceThreshold(threshold=0.071)
-    data_array = selector.fit_transform(data)
-    selected_columns = data.columns[selector.get_support()]
-    data = pd.DataFrame(data_array, columns=selected_columns)
-
-    # Permutation Feature Importance
-    baseline_score = silhouette_score(data, KMeans(n_clusters=3, random_state=0).fit_predict(data))
-    importance_scores = {}
-
-    for col in data.columns:
-        data_permuted = data.copy()
-        data_permuted[col] = rng.permutation(data_permuted[col])
-        permuted_score = silhouette_score(data_permuted, KMeans(n_clusters=3, random_state=0).fit_predict(data_permuted))
-        drop = baseline_score - permuted_score
-        importance_scores[col] = drop
-
-    importance_df = pd.DataFrame.from_dict(importance_scores, orient='index', columns=['silhouette_drop'])
-    importance_df = importance_df.sort_values(by='silhouette_drop', ascending=False)
-
-    selected_features = importance_df[importance_df['silhouette_drop'] > 0].index
-    data_selected = data[selected_features]
-
-    # PCA and clustering
-    pca = PCA(n_components=3)
-    data_pca_3d = pca.fit_transform(data_selected)
-    labels = KMeans(n_clusters=3, random_state=0).fit_predict(data_pca_3d)
-    score = silhouette_score(data_pca_3d, labels)
-    print(f"Silhouette Score after PCA (seed {seed}): {score:.4f}")
-
-    if score > best_score:
-        best_score = score
-        best_run_data = {
-            "labels": labels,
-            "selected_features": selected_features,
-            "importance_df": importance_df,
-            "pca_data": data_pca_3d,
-            "data_selected": data_selected,
-            "seed": seed
-        }
-
-# Save and report best result
-print(f"\n🎯 Best Silhouette Score: {best_score:.4f} from seed {best_run_data['seed']}")
-# pd.DataFrame(best_run_data['selected_features']).to_csv('best_selected_features.csv', index=False)
-
-# Get features from best run
-best_data_selected = best_run_data['data_selected']
-
-# Plot the HeatMap of feature correlations from the best seed
-plt.figure(figsize=(18, 16))
-corr = best_data_selected.corr()
-
-
-sns.heatmap(
-    corr,
-    annot=False,
-    cmap='coolwarm',
-    linewidths=0.5,
-    cbar_kws={"shrink": 0.5}
-)
-
-plt.title(f"Correlation Heatmap of Selected Features (Best Seed = {best_run_data['seed']})")
-plt.xticks(rotation=90, ha='center', fontsize=8)
-plt.yticks(fontsize=8)
-plt.tight_layout()
-plt.show()
-
-# 3D plot
-fig = plt.figure(figsize=(10, 7))
-ax = fig.add_subplot(111, projection='3d')
-sc = ax.scatter(best_run_data['pca_data'][:, 0],
-                best_run_data['pca_data'][:, 1],
-                best_run_data['pca_data'][:, 2],
-                c=best_run_data['labels'], cmap='viridis', s=40)
-ax.set_title(f"Best Clustering (seed={best_run_data['seed']})")
-ax.set_xlabel("PC1")
-ax.set_ylabel("PC2")
-ax.set_zlabel("PC3")
-plt.show()
-
-
-# Cluster summary
-clustered = best_run_data['data_selected'].copy()
-clustered['cluster'] = best_run_data['labels']
-summary = clustered.groupby('cluster').mean().T
-
-binary_columns = [col for col in summary.index if summary.loc[col].max() <= 1.0 and col != 'What is your age?']
-summary.loc[binary_columns] *= 100
-# Save to CSV
-summary.to_csv('best_cluster_summary.csv')
+import plots
+import profiling
+from artifacts import iter_frame_chunks, load_sparse, save_frame
+from clustering import densify_if_dense, stream_kmeans
+from ksweep import elbow, fit_kmeans, k_sweep
+from lazy import lazy_import
+from memo import memoized
+from result_cache import CACHE_FILE, ResultCache
+from seed_sweep import SeedStore, seed_sweep, selected_features
+from silhouette import distance_matrix, silhouette_values
+
+# Only needed for the plots, imported when the first plot is drawn
+plt = lazy_import('matplotlib.pyplot')
+sns = lazy_import('seaborn')
+
+
+def variance_filter(matrix, columns, threshold):
+    # Filters a sparse matrix without densifying it
+    selector = VarianceThreshold(threshold=threshold)
+    selected = selector.fit_transform(matrix)
+    selected_columns = [col for col, keep in zip(columns, selector.get_support()) if keep]
+    return selected, selected_columns
+
+
+def cluster_summary(means):
+    """
+    Feature x cluster table of the cluster means, with the 0/1 features as percentages.
+
+    Parameters:
+    means (pd.DataFrame): Mean of every feature per cluster, indexed by cluster.
+    """
+    summary = means.T
+    binary_columns = [col for col in summary.index if summary.loc[col].max() <= 1.0 and col != 'What is your age?']
+    summary.loc[binary_columns] *= 100
+    return summary
+
+
+def plot_elbow(k_values, scores, elbow):
+    fig, ax = plt.subplots()
+    ax.plot(k_values, scores, marker='D')
+    if elbow is not None:
+        elbow_score = scores[k_values.index(elbow)]
+        ax.axvline(elbow, color='black', linestyle='--', label=f"elbow at $k={elbow}$, $score={elbow_score:0.3f}$")
+        ax.legend(loc='best', fontsize='medium', frameon=True)
+    ax.set_title("Distortion Score Elbow for KMeans Clustering")
+    ax.set_xlabel("k")
+    ax.set_ylabel("distortion score")
+
+
+def plot_silhouette(labels, values, n_clusters):
+    # Silhouette plot in the style of yellowbrick's SilhouetteVisualizer, of the values of the silhouette backend
+    colors = plt.get_cmap('tab10')
+
+    fig, ax = plt.subplots()
+    y_lower = 10
+    for cluster in range(n_clusters):
+        cluster_values = sorted(values[labels == cluster])
+        y_upper = y_lower + len(cluster_values)
+        ax.fill_betweenx(range(y_lower, y_upper), 0, cluster_values,
+                         facecolor=colors(cluster), edgecolor=colors(cluster), alpha=0.5)
+        ax.text(-0.05, y_lower + 0.5 * len(cluster_values), str(cluster))
+        y_lower = y_upper + 10
+
+    ax.axvline(x=values.mean(), color='red', linestyle='--', label='Average Silhouette Score')
+    ax.set_title(f"Silhouette Plot of KMeans Clustering for {len(values)} Samples in {n_clusters} Centers")
+    ax.set_xlabel("silhouette coefficient values")
+    ax.set_ylabel("cluster label")
+    ax.set_yticks([])
+    ax.legend(loc='best')
+
+
+def plot_correlation(corr, seed):
+    plt.figure(figsize=(18, 16))
+    sns.heatmap(
+        corr,
+        annot=False,
+        cmap='coolwarm',
+        linewidths=0.5,
+        cbar_kws={"shrink": 0.5}
+    )
+
+    plt.title(f"Correlation Heatmap of Selected Features (Best Seed = {seed})")
+    plt.xticks(rotation=90, ha='center', fontsize=8)
+    plt.yticks(fontsize=8)
+    plt.tight_layout()
+
+
+def plot_clusters_3d(pca_data, labels, seed):
+    fig = plt.figure(figsize=(10, 7))
+    ax = fig.add_subplot(111, projection='3d')
+    sc = ax.scatter(pca_data[:, 0],
+                    pca_data[:, 1],
+                    pca_data[:, 2],
+                    c=labels, cmap='viridis', s=40)
+    ax.set_title(f"Best Clustering (seed={seed})")
+    ax.set_xlabel("PC1")
+    ax.set_ylabel("PC2")
+    ax.set_zlabel("PC3")
+
+
+def run(input_path='processed_data.npz', output_path='best_cluster_summary.parquet', n_runs=4,
+        variance_threshold=0.071, n_clusters=3, n_workers=None, warm_start=False, n_repeats=1,
+        early_stopping=True, silhouette_mode='exact', silhouette_sample_size=2000, max_matrix_rows=5000,
+        k_values=range(1, 8), sweep_warm_start=False, engine='full', seed_dir='.seed_runs', seed_batch_size=8,
+        dtype=None, projection='auto', result_cache=CACHE_FILE, result_cache_mb=64, dense_min_density=0.1,
+        max_dense_mb=512, plot_mode=None, plot_dir='plots'):
+    # Figures in the mode the pipeline passed in, which is part of the stage's parameters: a run with another
+    # mode re-runs the stage instead of skipping it without figures
+    if plot_mode is not None:
+        plots.configure(plot_mode, plot_dir)
+
+    # Every silhouette below goes through the same backend: 'exact', 'sample' or 'simplified'
+    silhouette_options = {'mode': silhouette_mode, 'sample_size': silhouette_sample_size}
+
+    # Feature matrix in its stored dtype unless another one is asked for (a float32 matrix stays float32 through
+    # PCA and KMeans). It stays sparse only if it is truly sparse or too large to densify: on a few-percent dense
+    # matrix the sparse distance and k-means kernels are several times slower than the dense ones
+    layout = {'min_density': dense_min_density, 'max_dense_bytes': max_dense_mb * 2 ** 20}
+    matrix, columns = load_sparse(input_path)
+    if dtype is not None:
+        matrix = matrix.astype(dtype, copy=False)
+    matrix = densify_if_dense(matrix, **layout)
+
+    # Inertia and silhouette per k, for the elbow plot or to choose k (n_clusters='elbow' or 'silhouette');
+    # plots are rendered as configured in plots.py, and the sweep is skipped when nothing uses it
+    sweep_needed = plots.enabled() or n_clusters in ('elbow', 'silhouette')
+
+    # The exact scores of the sweep, the baseline and the plot share one distance matrix when it fits in memory;
+    # a single exact score does not need it, and it is dropped before the seed sweep
+    distances = None
+    if silhouette_mode == 'exact' and sweep_needed and matrix.shape[0] <= max_matrix_rows:
+        distances = distance_matrix(matrix)
+
+    if sweep_needed:
+        with profiling.section('kmeans.k_sweep', matrix):
+            sweep, _ = memoized('k_sweep', matrix,
+                                lambda: k_sweep(matrix, k_values, n_workers=n_workers, warm_start=sweep_warm_start,
+                                                silhouette_options=silhouette_options, distances=distances,
+                                                engine=engine),
+                                tuple(k_values), sweep_warm_start, tuple(sorted(silhouette_options.items())),
+                                engine)
+        elbow_k = elbow(sweep)
+        print(sweep.to_string(float_format=lambda x: f"{x:.4f}"))
+        if n_clusters == 'elbow' and elbow_k is None:
+            print("⚠️ The inertia curve has no elbow, the k with the best silhouette is used instead")
+            n_clusters = 'silhouette'
+        if n_clusters == 'elbow':
+            n_clusters = elbow_k
+        elif n_clusters == 'silhouette':
+            if sweep['silhouette'].isna().all():
+                raise ValueError(f"Choosing k by silhouette needs a k > 1 in k_values, got {list(sweep.index)}")
+            n_clusters = int(sweep['silhouette'].idxmax())
+        print(f"Number of clusters: {n_clusters} (elbow at k={elbow_k})")
+        if plots.enabled():
+            plots.render('elbow', plot_elbow, list(sweep.index), list(sweep['inertia']), elbow_k)
+
+    # K-Mean of the unfiltered matrix, only for the silhouette plot (fitted once per dataset and shared with the
+    # sweep above), so plots off skips the fit and its silhouette values
+    if plots.enabled():
+        model = fit_kmeans(matrix, n_clusters, engine)
+        lab = model.labels_
+        rows, values = silhouette_values(matrix, lab, centers=model.cluster_centers_, distances=distances,
+                                         **silhouette_options)
+        plots.render('silhouette', plot_silhouette, lab[rows], values, n_clusters)
+    distances = None
+
+    # Filter data, the seeds below all share the filtered data and its baseline clustering
+    with profiling.section('kmeans.variance_filter', matrix) as timing:
+        data, data_columns = memoized('variance_filter', matrix,
+                                      lambda: variance_filter(matrix, columns, variance_threshold),
+                                      variance_threshold, tuple(columns))
+        # A matrix too large to densify may fit once filtered
+        data = timing.output(densify_if_dense(data, **layout))
+
+    # Permutation Feature Importance and PCA clustering per seed, run in parallel and saved seed by seed,
+    # so an interrupted run resumes with the seeds it had not finished
+    store = None
+    if seed_dir is not None:
+        store = SeedStore(seed_dir, data, {
+            'columns': data_columns, 'n_clusters': n_clusters, 'warm_start': warm_start, 'n_repeats': n_repeats,
+            'early_stopping': early_stopping, 'silhouette_options': silhouette_options, 'engine': engine,
+            'projection': projection})
+    # and the permutation refits are cached on disk across runs and settings (LRU, result_cache_mb at most)
+    cache = ResultCache(result_cache, max_bytes=result_cache_mb * 2 ** 20) if result_cache is not None else None
+    try:
+        with profiling.section('kmeans.seed_sweep', data):
+            results, best = seed_sweep(data, data_columns, range(n_runs), n_clusters=n_clusters,
+                                       n_workers=n_workers, batch_size=seed_batch_size, store=store,
+                                       silhouette_options=silhouette_options, engine=engine, projection=projection,
+                                       warm_start=warm_start, n_repeats=n_repeats, early_stopping=early_stopping,
+                                       cache=cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    for seed, (_, score) in results.items():
+        print(f"\n==== RUN {seed} ====")
+        print(f"Silhouette Score after PCA (seed {seed}): {score:.4f}")
+
+    # Best seed, deterministic whatever order the seeds finished in; only its clustering is kept in memory,
+    # as the sweep computed it
+    seed, data_pca_3d, labels = best
+    importance_df, best_score = results[seed]
+    features = selected_features(importance_df)
+    # Only the selected features of the best seed are densified
+    position = {col: i for i, col in enumerate(data_columns)}
+    best_selection = data[:, [position[col] for col in features]]
+    if sp.issparse(best_selection):
+        best_selection = best_selection.toarray()
+    best_data_selected = pd.DataFrame(best_selection, columns=features)
+    best_run_data = {
+        "labels": labels,
+        "selected_features": features,
+        "importance_df": importance_df,
+        "pca_data": data_pca_3d,
+        "data_selected": best_data_selected,
+        "seed": seed
+    }
+
+    # Save and report best result
+    print(f"\n🎯 Best Silhouette Score: {best_score:.4f} from seed {best_run_data['seed']}")
+    # pd.DataFrame(best_run_data['selected_features']).to_csv('best_selected_features.csv', index=False)
+
+    # Plot the HeatMap of feature correlations and the clusters from the best seed
+    if plots.enabled():
+        plots.render('feature_correlation', plot_correlation, best_data_selected.corr(), best_run_data['seed'])
+        plots.render('clusters_3d', plot_clusters_3d, best_run_data['pca_data'], best_run_data['labels'],
+                     best_run_data['seed'])
+
+    # Cluster summary
+    clustered = best_run_data['data_selected'].copy()
+    clustered['cluster'] = best_run_data['labels']
+    summary = cluster_summary(clustered.groupby('cluster').mean())
+    # Save the summary (Parquet, Arrow or CSV by extension)
+    save_frame(summary, output_path, index=True)
+
+    return summary
+
+
+def run_streaming(input_path='processed_data.parquet', output_path='best_cluster_summary.parquet', n_clusters=3,
+                  columns=None, chunk_rows=100_000, n_epochs=3, dtype='float64'):
+    """
+    Out-of-core variant of run() for panels that do not fit in memory: mini-batch k-means over chunked reads
+    of the dense processed table, without the feature selection. Writes the same cluster summary.
+
+    Parameters:
+    input_path (str): Processed table written by the encoding stage (Parquet, Arrow or CSV).
+    columns (list): Features to cluster on, all columns if None.
+    chunk_rows (int): Rows read and fitted at a time.
+    n_epochs (int): Passes over the table for fitting.
+    dtype (str): Float dtype of the chunks, 'float32' for half the memory.
+
+    Returns:
+    tuple: (np.ndarray of labels, np.ndarray of centroids, pd.DataFrame summary).
+    """
+    model, labels, means = stream_kmeans(lambda: iter_frame_chunks(input_path, chunk_rows, columns), n_clusters,
+                                         n_epochs=n_epochs, dtype=dtype)
+    print(f"Streaming k-means: {len(labels)} rows, inertia {model.inertia_:.4f}, "
+          f"cluster sizes {np.bincount(labels, minlength=n_clusters).tolist()}")
+    summary = cluster_summary(means)
+    save_frame(summary, output_path, index=True)
+    return labels, model.cluster_centers_, summary
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,228 @@
+import os
+
+import numpy as np
+
+from lazy import lazy_import
+
+# Imported on first use, so that importing the path helpers below stays cheap
+pd = lazy_import('pandas')
+sp = lazy_import('scipy.sparse')
+
+# File format of the intermediate artifacts written between stages, chosen by extension
+FORMATS = {'.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.csv': 'csv'}
+EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}
+
+
+def artifact_path(name, fmt='parquet'):
+    return name + EXTENSIONS[fmt]
+
+
+def _format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Unsupported artifact format {ext!r} for {path}, expected one of {sorted(FORMATS)}")
+    return FORMATS[ext]
+
+
+def compact_dtypes(df):
+    """
+    Downcasts 0/1 indicator columns to uint8, whole-number columns to the smallest integer type and
+    other float columns to float32.
+
+    Parameters:
+    df (pd.DataFrame): Numeric feature matrix, e.g. the encoded survey.
+
+    Returns:
+    pd.DataFrame: The same values in compact dtypes.
+    """
+    dtypes = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_bool_dtype(values) or (
+                isinstance(values.dtype, np.dtype) and pd.api.types.is_numeric_dtype(values)
+                and values.isin([0, 1]).all()):
+            dtypes[col] = np.uint8
+        elif isinstance(values.dtype, np.dtype) and pd.api.types.is_float_dtype(values):
+            if values.notna().all() and (values == np.round(values)).all():
+                dtypes[col] = pd.to_numeric(values.astype(np.int64), downcast='integer').dtype
+            else:
+                dtypes[col] = np.float32
+    return df.astype(dtypes)
+
+
+def save_frame(df, path, index=False):
+    """
+    Writes a DataFrame as Parquet, Arrow IPC (Feather) or CSV depending on the file extension.
+    """
+    fmt = _format(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=index)
+    elif fmt == 'parquet':
+        df.to_parquet(path, index=index)
+    else:
+        if index:
+            df = df.reset_index()
+        df.to_feather(path)
+
+
+def load_frame(path, columns=None, index=False, dtype=None):
+    """
+    Reads a DataFrame written by save_frame.
+
+    Parameters:
+    path (str): Artifact file, the format is taken from the extension.
+    columns (list): Only load these columns (column projection, cheap for Parquet and Arrow).
+    index (bool): The frame was saved with index=True.
+    dtype (dict): Column dtypes for CSV files, Parquet and Arrow keep the dtypes they were written with.
+
+    Returns:
+    pd.DataFrame: The loaded frame.
+    """
+    fmt = _format(path)
+    if fmt == 'parquet':
+        return pd.read_parquet(path, columns=columns)
+
+    if fmt == 'csv':
+        if index:
+            df = pd.read_csv(path, index_col=0, dtype=dtype)
+            return df if columns is None else df[list(columns)]
+        df = pd.read_csv(path, usecols=columns, dtype=dtype)
+        # usecols keeps the order of the file, return the columns in the requested order
+        return df if columns is None else df[list(columns)]
+
+    if not index:
+        return pd.read_feather(path, columns=columns)
+    df = pd.read_feather(path)
+    df = df.set_index(df.columns[0])
+    # reset_index() names an unnamed index 'index', undo that
+    if df.index.name == 'index':
+        df.index.name = None
+    return df if columns is None else df[list(columns)]
+
+
+def iter_frame_chunks(path, chunk_rows=100_000, columns=None):
+    """
+    Reads a DataFrame written by save_frame (index=False) in chunks of rows, so a table that does not fit in
+    memory can be processed one chunk at a time. Parquet is read by row batches and Arrow through a memory map.
+
+    Parameters:
+    path (str): Artifact file, the format is taken from the extension.
+    chunk_rows (int): Maximum number of rows per chunk.
+    columns (list): Only load these columns.
+
+    Yields:
+    pd.DataFrame: Consecutive chunks of rows, with a default index.
+    """
+    fmt = _format(path)
+    if fmt == 'csv':
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_rows):
+            yield chunk if columns is None else chunk[list(columns)]
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        import pyarrow as pa
+
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(list(columns))
+                for start in range(0, batch.num_rows, chunk_rows):
+                    yield batch.slice(start, chunk_rows).to_pandas()
+
+
+def save_sparse(matrix, columns, path):
+    """
+    Writes a sparse feature matrix and its column names to a compressed .npz file.
+    Only the non-zeros are stored, so the file size scales with them and not with rows x columns.
+    """
+    matrix = sp.csr_matrix(matrix)
+    np.savez_compressed(path, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                        shape=np.array(matrix.shape), columns=np.array(columns, dtype=str))
+
+
+def load_sparse(path, columns=None):
+    """
+    Reads a matrix written by save_sparse.
+
+    Parameters:
+    path (str): The .npz file.
+    columns (list): Only return these columns, in this order.
+
+    Returns:
+    tuple: (scipy.sparse.csr_matrix, list of column names).
+    """
+    with np.load(path) as f:
+        matrix = sp.csr_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+        names = f['columns'].tolist()
+    if columns is None:
+        return matrix, names
+    position = {name: i for i, name in enumerate(names)}
+    return matrix[:, [position[name] for name in columns]], list(columns)
+
+
+def sparse_dtypes(matrix):
+    """
+    The compact_dtypes of the dense table of a sparse matrix, computed from its non-zeros only: uint8 for 0/1
+    columns, the smallest integer type for whole-number columns, float32 otherwise.
+
+    Returns:
+    list: One dtype per column.
+    """
+    matrix = sp.csc_matrix(matrix)
+    n_rows = matrix.shape[0]
+    dtypes = []
+    for col in range(matrix.shape[1]):
+        values = matrix.data[matrix.indptr[col]:matrix.indptr[col + 1]]
+        if len(values) < n_rows:
+            # The column also holds (implicit) zeros
+            values = np.append(values, 0)
+        if np.isin(values, [0, 1]).all():
+            dtypes.append(np.dtype(np.uint8))
+        elif not np.isnan(values).any() and (values == np.round(values)).all():
+            extremes = pd.Series([values.min(), values.max()]).astype(np.int64)
+            dtypes.append(pd.to_numeric(extremes, downcast='integer').dtype)
+        else:
+            dtypes.append(np.dtype(np.float32))
+    return dtypes
+
+
+def _table_chunks(matrix, columns, chunk_rows):
+    # Dense, compactly typed frames of chunk_rows rows of a sparse matrix
+    matrix = sp.csr_matrix(matrix)
+    dtypes = dict(zip(columns, sparse_dtypes(matrix)))
+    for start in range(0, max(matrix.shape[0], 1), chunk_rows):
+        yield pd.DataFrame(matrix[start:start + chunk_rows].toarray(), columns=columns).astype(dtypes)
+
+
+def save_sparse_table(matrix, columns, path, chunk_rows=10_000):
+    """
+    Writes the dense table of a sparse feature matrix (Parquet, Arrow IPC or CSV by extension), with the
+    dtypes of compact_dtypes, chunk_rows rows at a time: memory holds one dense chunk, never the whole table.
+    """
+    fmt = _format(path)
+    if fmt == 'csv':
+        for i, chunk in enumerate(_table_chunks(matrix, columns, chunk_rows)):
+            chunk.to_csv(path, index=False, mode='w' if i == 0 else 'a', header=i == 0)
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in _table_chunks(matrix, columns, chunk_rows):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                if fmt == 'parquet':
+                    writer = pq.ParquetWriter(path, table.schema)
+                else:
+                    writer = pa.ipc.new_file(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
@@ -0,0 +1,67 @@
+"""
+Speed of the single-pass CategoricalEncoder against the per-column concat loop that one_hot_encode_columns
+used before, on wide synthetic survey answers. Both must give the same frame.
+
+Run from the repository root:
+    python -m benchmarks.categorical_encoding
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_preparation_encoding import one_hot_encode_columns
+
+SHAPES = [(1_000, 40), (10_000, 40), (10_000, 200), (50_000, 200)]
+ANSWERS = ['Yes', 'No', "I don't know", 'Not applicable', 'Sometimes', 'Often']
+
+
+def concat_loop_encode(df, columns_drop_first_true, columns_drop_first_false):
+    # The previous implementation: one get_dummies and one copy of the growing frame per column
+    encoded_df = df.copy()
+    for col in columns_drop_first_true + columns_drop_first_false:
+        if col not in encoded_df.columns:
+            continue
+        drop_first = col in columns_drop_first_true
+        unique_values = sorted(encoded_df[col].dropna().unique())
+        if 'Not applicable' in unique_values:
+            unique_values = ['Not applicable'] + [v for v in unique_values if v != 'Not applicable']
+        encoded_df[col] = pd.Categorical(encoded_df[col], categories=unique_values, ordered=True)
+        prefix = col[:150].replace(' ', '_')
+        dummies = pd.get_dummies(encoded_df[col], prefix=prefix, drop_first=drop_first).astype(int)
+        encoded_df = pd.concat([encoded_df, dummies], axis=1).drop(columns=[col])
+    return encoded_df
+
+
+def survey(n_rows, n_columns, seed=0):
+    # Categorical answer columns with a few missing values, plus one numeric column that is left as is
+    rng = np.random.default_rng(seed)
+    data = {'age': rng.integers(18, 70, n_rows)}
+    for i in range(n_columns):
+        answers = rng.choice(ANSWERS[:rng.integers(2, len(ANSWERS) + 1)], size=n_rows).astype(object)
+        answers[rng.random(n_rows) < 0.05] = None
+        data[f'Question {i}?'] = answers
+    return pd.DataFrame(data)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark(n_rows, n_columns):
+    df = survey(n_rows, n_columns)
+    columns = [col for col in df.columns if col != 'age']
+    drop_true, drop_false = columns[::2], columns[1::2]
+
+    reference, reference_time = timed(concat_loop_encode, df, drop_true, drop_false)
+    encoded, seconds = timed(one_hot_encode_columns, df, drop_true, drop_false)
+    pd.testing.assert_frame_equal(encoded, reference)
+    return {'n_rows': n_rows, 'n_columns': n_columns, 'n_encoded': encoded.shape[1],
+            'concat_loop_s': reference_time, 'single_pass_s': seconds, 'speedup': reference_time / seconds}
+
+
+if __name__ == '__main__':
+    results = pd.DataFrame([benchmark(n_rows, n_columns) for n_rows, n_columns in SHAPES])
+    print(results.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
@@ -0,0 +1,69 @@
+"""
+The clustering path of Kmeans.py (variance filter, KMeans on the sparse matrix, PCA and KMeans on the densified
+features, simplified silhouette) in float64 against float32, on processed_data.npz repeated to panels of growing
+size. Reports the time, the peak memory allocated (tracemalloc) and the size of the matrix, and checks that both
+dtypes find the same clusters (adjusted Rand index).
+
+Run from the repository root, after main.py has written processed_data.npz:
+    python -m benchmarks.float32_path
+"""
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.decomposition import PCA
+from sklearn.metrics import adjusted_rand_score
+
+from artifacts import load_sparse
+from clustering import make_kmeans
+from Kmeans import variance_filter
+from silhouette import silhouette_score
+
+REPEATS = [1, 10, 50]
+N_CLUSTERS = 3
+VARIANCE_THRESHOLD = 0.071
+
+
+def clustering_path(matrix, columns):
+    data, _ = variance_filter(matrix, columns, VARIANCE_THRESHOLD)
+    labels = make_kmeans(N_CLUSTERS).fit(data).labels_
+    data_pca_3d = PCA(n_components=3).fit_transform(data.toarray())
+    model = make_kmeans(N_CLUSTERS).fit(data_pca_3d)
+    score = silhouette_score(data_pca_3d, model.labels_, mode='simplified', centers=model.cluster_centers_)
+    return labels, model.labels_, score
+
+
+def measured(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / 2 ** 20
+
+
+def matrix_mb(matrix):
+    return (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 2 ** 20
+
+
+def benchmark(matrix, columns, repeats):
+    panel = sp.vstack([matrix] * repeats, format='csr')
+    rows = []
+    results = {}
+    for dtype in (np.float64, np.float32):
+        values = panel.astype(dtype)
+        results[dtype], seconds, peak = measured(clustering_path, values, columns)
+        rows.append({'n_rows': panel.shape[0], 'dtype': np.dtype(dtype).name, 'matrix_mb': matrix_mb(values),
+                     'seconds': seconds, 'peak_mb': peak, 'silhouette': results[dtype][2]})
+    rows[1]['ari_sparse'] = adjusted_rand_score(results[np.float64][0], results[np.float32][0])
+    rows[1]['ari_pca'] = adjusted_rand_score(results[np.float64][1], results[np.float32][1])
+    return rows
+
+
+if __name__ == '__main__':
+    matrix, columns = load_sparse('processed_data.npz')
+    results = pd.DataFrame([row for repeats in REPEATS for row in benchmark(matrix, columns, repeats)])
+    print(results.to_string(index=False, float_format=lambda x: f"{x:.4f}", na_rep=''))
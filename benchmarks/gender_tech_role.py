@@ -0,0 +1,52 @@
+"""
+Row-by-row .apply(clean_gender / is_tech_role) against the vectorized normalize_gender / infer_tech_role
+on a 1M-row synthetic column drawn from the survey's own spellings. Both must give the same result.
+
+Run from the repository root:
+    python -m benchmarks.gender_tech_role
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from fixing_missing_values import clean_gender, infer_tech_role, is_tech_role, normalize_gender
+
+N_ROWS = 1_000_000
+GENDER_COLUMN = 'What is your gender?'
+POSITION_COLUMN = 'Which of the following best describes your work position?'
+
+
+def synthetic_column(values, n_rows, seed=0):
+    # Resamples the observed answers (missing ones included) with random case and padding variations
+    rng = np.random.default_rng(seed)
+    sample = pd.Series(rng.choice(np.asarray(values, dtype=object), size=n_rows), dtype=object)
+    present = sample.notna()
+    upper = present & (rng.random(n_rows) < 0.1)
+    sample[upper] = sample[upper].str.upper()
+    padded = present & (rng.random(n_rows) < 0.1)
+    sample[padded] = ' ' + sample[padded] + ' '
+    return sample
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark(name, column, scalar, vectorized):
+    reference, reference_time = timed(column.apply, scalar)
+    result, seconds = timed(vectorized, column)
+    pd.testing.assert_series_equal(result, reference, check_dtype=False)
+    return {'normalizer': name, 'n_rows': len(column), 'n_distinct': column.nunique(),
+            'apply_s': reference_time, 'vectorized_s': seconds, 'speedup': reference_time / seconds}
+
+
+if __name__ == '__main__':
+    survey = pd.read_csv('data/mental-health.csv', usecols=[GENDER_COLUMN, POSITION_COLUMN])
+    results = pd.DataFrame([
+        benchmark('gender', synthetic_column(survey[GENDER_COLUMN], N_ROWS), clean_gender, normalize_gender),
+        benchmark('tech role', synthetic_column(survey[POSITION_COLUMN], N_ROWS), is_tech_role, infer_tech_role),
+    ])
+    print(results.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
@@ -0,0 +1,64 @@
+"""
+Import time of main.py and of every stage module, measured with python -X importtime in a fresh interpreter.
+The optional plotting and text dependencies must not be imported until they are used: the run fails (exit
+status 1) if importing a module pulls in one of them, or if --max-ms is given and a module takes longer.
+
+Run from the repository root:
+    python -m benchmarks.import_time [--max-ms 2000]
+"""
+import argparse
+import subprocess
+import sys
+
+import pandas as pd
+
+MODULES = ['main', 'pipeline', 'fixing_missing_values', 'data_preparation_encoding', 'Kmeans',
+           'summary_interpret']
+# Only needed for plots or text features, so importing a stage must not import them
+DEFERRED = ['matplotlib', 'seaborn', 'yellowbrick', 'nltk', 'sklearn.feature_extraction']
+
+
+def import_times(module):
+    """
+    Imports module in a fresh interpreter with -X importtime.
+
+    Returns:
+    dict: Imported module name -> cumulative import time in milliseconds.
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                               capture_output=True, text=True, check=True)
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def benchmark(module):
+    times = import_times(module)
+    deferred = sorted(name for name in times if name in DEFERRED)
+    heaviest = sorted((name for name in times if name != module and '.' not in name),
+                      key=times.get, reverse=True)[:3]
+    return {'module': module, 'import_ms': times[module], 'n_modules': len(times),
+            'heaviest': ', '.join(f"{name} {times[name]:.0f}ms" for name in heaviest),
+            'deferred_imported': ', '.join(deferred)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import time of the pipeline modules.")
+    parser.add_argument('--max-ms', type=float, default=None, help="Fail if a module takes longer to import.")
+    args = parser.parse_args()
+
+    results = pd.DataFrame([benchmark(module) for module in MODULES])
+    print(results.to_string(index=False, float_format=lambda x: f"{x:.1f}"))
+
+    failures = [f"{row.module} imports {row.deferred_imported}"
+                for row in results.itertuples() if row.deferred_imported]
+    if args.max_ms is not None:
+        failures += [f"{row.module} takes {row.import_ms:.0f}ms (> {args.max_ms:.0f}ms)"
+                     for row in results.itertuples() if row.import_ms > args.max_ms]
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,60 @@
+"""
+Full-batch KMeans on the in-memory matrix against the 'minibatch' engine on the same matrix and the out-of-core
+stream_kmeans over a Parquet file read in chunks, on synthetic clustered panels of growing size. Reports the
+fit time, the peak memory allocated during the fit (tracemalloc, the input matrix of the in-memory engines is
+allocated before and not counted, nor are Arrow's own read buffers) and the inertia relative to full-batch.
+
+Run from the repository root:
+    python -m benchmarks.kmeans_engines
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from sklearn.datasets import make_blobs
+
+from artifacts import iter_frame_chunks, save_frame
+from clustering import make_kmeans, stream_kmeans
+
+N_ROWS = [10_000, 100_000, 500_000]
+N_FEATURES = 40
+N_CLUSTERS = 3
+CHUNK_ROWS = 50_000
+
+
+def measured(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / 2 ** 20
+
+
+def benchmark(n_rows, directory):
+    values, _ = make_blobs(n_samples=n_rows, n_features=N_FEATURES, centers=N_CLUSTERS, cluster_std=3.0,
+                           random_state=0)
+    path = os.path.join(directory, f"panel_{n_rows}.parquet")
+    save_frame(pd.DataFrame(values, columns=[f"f{i}" for i in range(N_FEATURES)]), path)
+
+    full, full_s, full_mb = measured(make_kmeans(N_CLUSTERS, engine='full').fit, values)
+    minibatch, minibatch_s, minibatch_mb = measured(make_kmeans(N_CLUSTERS, engine='minibatch').fit, values)
+    (stream, _, _), stream_s, stream_mb = measured(
+        stream_kmeans, lambda: iter_frame_chunks(path, CHUNK_ROWS), N_CLUSTERS)
+
+    return [
+        {'n_rows': n_rows, 'engine': 'full', 'fit_s': full_s, 'peak_mb': full_mb, 'inertia_ratio': 1.0},
+        {'n_rows': n_rows, 'engine': 'minibatch', 'fit_s': minibatch_s, 'peak_mb': minibatch_mb,
+         'inertia_ratio': minibatch.inertia_ / full.inertia_},
+        {'n_rows': n_rows, 'engine': 'stream', 'fit_s': stream_s, 'peak_mb': stream_mb,
+         'inertia_ratio': stream.inertia_ / full.inertia_},
+    ]
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        results = pd.DataFrame([row for n_rows in N_ROWS for row in benchmark(n_rows, directory)])
+    print(results.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
@@ -0,0 +1,50 @@
+"""
+Accuracy and speed of the silhouette backends against sklearn's silhouette_score.
+
+Run from the repository root:
+    python -m benchmarks.silhouette_modes
+"""
+import time
+
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.datasets import make_blobs
+from sklearn.metrics import silhouette_score as sklearn_silhouette_score
+
+from silhouette import estimate_silhouette, silhouette_score
+
+SIZES = [1_000, 5_000, 20_000]
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def benchmark(n_rows, n_features=80, n_clusters=3, sample_size=2000):
+    X, _ = make_blobs(n_samples=n_rows, n_features=n_features, centers=n_clusters, cluster_std=6.0, random_state=0)
+    model = KMeans(n_clusters=n_clusters, random_state=0).fit(X)
+    labels = model.labels_
+
+    reference, reference_time = timed(sklearn_silhouette_score, X, labels)
+    rows = [{'n_rows': n_rows, 'mode': 'sklearn', 'score': reference, 'abs_error': 0.0,
+             'seconds': reference_time, 'ci': ''}]
+
+    score, seconds = timed(silhouette_score, X, labels, mode='exact')
+    rows.append({'n_rows': n_rows, 'mode': 'exact', 'score': score, 'abs_error': abs(score - reference),
+                 'seconds': seconds, 'ci': ''})
+
+    (score, lower, upper), seconds = timed(estimate_silhouette, X, labels, sample_size=sample_size)
+    rows.append({'n_rows': n_rows, 'mode': 'sample', 'score': score, 'abs_error': abs(score - reference),
+                 'seconds': seconds, 'ci': f"[{lower:.4f}, {upper:.4f}]"})
+
+    score, seconds = timed(silhouette_score, X, labels, mode='simplified', centers=model.cluster_centers_)
+    rows.append({'n_rows': n_rows, 'mode': 'simplified', 'score': score, 'abs_error': abs(score - reference),
+                 'seconds': seconds, 'ci': ''})
+    return rows
+
+
+if __name__ == '__main__':
+    results = pd.DataFrame([row for n_rows in SIZES for row in benchmark(n_rows)])
+    print(results.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
@@ -0,0 +1,143 @@
+"""
+Throughput of the pipeline stages and of their key functions on synthetic surveys of growing size
+(see benchmarks.synthetic_survey), in respondents per second.
+
+With --baseline the run is compared to a previous one and exits with status 1 if a benchmark's throughput fell
+by more than --tolerance; --save-baseline records this run as the reference. Throughput depends on the machine,
+so record the baseline on the machine that checks against it. The same checks run as pytest tests, one per tier,
+in benchmarks/test_survey_scaling.py.
+
+Run from the repository root:
+    python -m benchmarks.survey_scaling --save-baseline scaling_baseline.json
+    python -m benchmarks.survey_scaling --baseline scaling_baseline.json
+    python -m benchmarks.survey_scaling --tiers 1000000 10000000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import Kmeans
+import memo
+import plots
+from artifacts import save_sparse
+from benchmarks.synthetic_survey import generate_survey
+from clustering import make_kmeans
+from data_preparation_encoding import encode, process_and_align_text, stop_words
+from fixing_missing_values import clean, infer_tech_role, normalize_condition_column, normalize_gender
+from projection import project
+from silhouette import silhouette_score
+
+TIERS = [10_000, 100_000]
+MENTAL_TEXT = 'Why or why not bring up with a potential employer in an interview(mental health issue)_cleaned?'
+
+
+def timed(func, *args, repeats=1, **kwargs):
+    # Best of repeats, the memoized results of one call must not speed up the next
+    best = None
+    for _ in range(repeats):
+        memo.clear()
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return result, best
+
+
+def benchmark(n_rows, directory, repeats=1):
+    """
+    Times every stage and key function on a synthetic survey of n_rows respondents.
+
+    Returns:
+    list: One dict per benchmark with its name, the tier, the rows it processed, seconds and rows_per_s.
+    """
+    results = []
+
+    def record(name, rows, func, *args, **kwargs):
+        result, seconds = timed(func, *args, repeats=repeats, **kwargs)
+        results.append({'benchmark': name, 'tier': n_rows, 'rows': rows, 'seconds': seconds,
+                        'rows_per_s': rows / seconds})
+        return result
+
+    raw = record('generate', n_rows, generate_survey, n_rows)
+    raw.columns = raw.columns.str.strip()
+
+    # Cleaning stage and its regex passes
+    record('clean.normalize_gender', n_rows, normalize_gender, raw['What is your gender?'])
+    record('clean.infer_tech_role', n_rows, infer_tech_role,
+           raw['Which of the following best describes your work position?'])
+    record('clean.normalize_conditions', n_rows, normalize_condition_column,
+           raw['If yes, what condition(s) have you been diagnosed with?'])
+    cleaned = record('stage.fixing_missing_values', n_rows, clean, raw)
+
+    # Encoding stage (the numeric features, the TF-IDF features only serve the plots) and the TF-IDF modes
+    matrix, columns = record('stage.data_preparation_encoding', len(cleaned), encode, cleaned)
+    words = stop_words()
+    for mode in ('vocabulary', 'hashing'):
+        record(f"encode.tfidf_{mode}", len(cleaned), process_and_align_text, cleaned[MENTAL_TEXT], 'MH_TFIDF_',
+               cleaned, words, mode=mode)
+
+    # Clustering stage (one seed, centroid-based silhouettes, so the largest tiers stay feasible) and its kernels
+    data, data_columns = record('kmeans.variance_filter', matrix.shape[0], Kmeans.variance_filter, matrix, columns,
+                                0.071)
+    for engine in ('full', 'minibatch'):
+        record(f"kmeans.fit_{engine}", data.shape[0], make_kmeans(3, engine=engine).fit, data)
+    labels = make_kmeans(3).fit(data).labels_
+    record('kmeans.silhouette_sample', data.shape[0], silhouette_score, data, labels, mode='sample')
+    record('kmeans.projection', data.shape[0], project, data, data_columns, data_columns[:20])
+
+    input_path = os.path.join(directory, 'processed_data.npz')
+    save_sparse(matrix, columns, input_path)
+    record('stage.Kmeans', matrix.shape[0], Kmeans.run, input_path=input_path,
+           output_path=os.path.join(directory, 'best_cluster_summary.csv'), n_runs=1, n_workers=1,
+           silhouette_mode='simplified', seed_dir=None, result_cache=None)
+    return results
+
+
+def throughputs(results):
+    # Baseline entries of a run: '<benchmark>@<tier>' -> rows per second
+    return {f"{row.benchmark}@{row.tier}": row.rows_per_s for row in results.itertuples()}
+
+
+def regressions(results, baseline, tolerance):
+    # Benchmarks whose throughput fell below (1 - tolerance) x the baseline's
+    failures = []
+    for row in results.itertuples():
+        reference = baseline.get(f"{row.benchmark}@{row.tier}")
+        if reference is not None and row.rows_per_s < (1 - tolerance) * reference:
+            failures.append(f"{row.benchmark} at {row.tier} rows: {row.rows_per_s:,.0f} rows/s, "
+                            f"baseline {reference:,.0f} rows/s")
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Throughput of the pipeline on synthetic surveys.")
+    parser.add_argument('--tiers', type=int, nargs='+', default=TIERS, help="Numbers of respondents.")
+    parser.add_argument('--repeats', type=int, default=1, help="Runs per benchmark, the best one counts.")
+    parser.add_argument('--baseline', default=None, help="JSON of a previous run to compare with.")
+    parser.add_argument('--save-baseline', default=None, help="Write this run's throughput as a baseline.")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed drop in throughput relative to the baseline (0.25 = 25%%).")
+    args = parser.parse_args()
+
+    plots.configure('off')
+    with tempfile.TemporaryDirectory() as directory:
+        results = pd.DataFrame([row for n_rows in args.tiers
+                                for row in benchmark(n_rows, directory, repeats=args.repeats)])
+    print(results.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+
+    if args.save_baseline is not None:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(throughputs(results), f, indent=2)
+
+    failures = []
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            failures = regressions(results, json.load(f), args.tolerance)
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,76 @@
+"""
+Synthetic survey of any size with the schema of data/mental-health.csv, for scaling tests.
+
+Every synthetic respondent starts as a copy of a random real respondent, which keeps the joint missingness
+patterns (the employer questions a self-employed respondent skips, the diagnoses only given by respondents who
+have a disorder, ...). Then a share of the answers is redrawn so the rows are not plain duplicates:
+- a categorical or numeric answer is redrawn from the observed answers of its column, only where the template
+  answered it, and never for the columns the imputation rules condition on;
+- a free-text answer is replaced by as many words as the template's answer, drawn from the words of its column,
+  so the lengths follow the real ones while new n-grams appear.
+
+Run from the repository root to write a synthetic survey, e.g. for python main.py:
+    python -m benchmarks.synthetic_survey 100000 data/synthetic-100k.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from fixing_missing_values import DIAGNOSIS_FILL_RULES, EMPLOYMENT_FILL_RULES
+
+SOURCE = 'data/mental-health.csv'
+TEXT_COLUMNS = ['Why or why not?', 'Why or why not?.1']
+# Their answers decide which other answers are missing, redrawing them would break the imputation rules
+GATE_COLUMNS = {col for _, condition, _, _ in DIAGNOSIS_FILL_RULES + EMPLOYMENT_FILL_RULES for col in condition}
+
+
+def _synthetic_text(template, pool, rng):
+    # Texts with the word counts of the template texts, words drawn from the column's words
+    lengths = template.str.split().str.len().to_numpy()
+    words = rng.choice(pool, size=int(lengths.sum()))
+    ends = np.cumsum(lengths)
+    return pd.Series([' '.join(words[end - n:end]) for n, end in zip(lengths, ends)], index=template.index)
+
+
+def generate_survey(n_rows, seed=0, redraw=0.5, source=SOURCE):
+    """
+    Synthetic survey with the columns, answer vocabularies, missingness patterns and free-text lengths of the
+    real one.
+
+    Parameters:
+    n_rows (int): Number of respondents.
+    seed (int): Seed of the generator, equal seeds give equal surveys.
+    redraw (float): Share of the answers redrawn instead of copied from the template respondent.
+    source (str): The real survey.
+
+    Returns:
+    pd.DataFrame: The synthetic survey, in the format of pd.read_csv(source).
+    """
+    real = pd.read_csv(source)
+    rng = np.random.default_rng(seed)
+    survey = real.iloc[rng.integers(0, len(real), size=n_rows)].reset_index(drop=True)
+
+    for col in real.columns:
+        if col.strip() in GATE_COLUMNS:
+            continue
+        observed = real[col].dropna()
+        redrawn = survey[col].notna().to_numpy() & (rng.random(n_rows) < redraw)
+        if not redrawn.any():
+            continue
+        if col in TEXT_COLUMNS:
+            pool = np.array(' '.join(observed.astype(str)).split(), dtype=object)
+            survey.loc[redrawn, col] = _synthetic_text(survey.loc[redrawn, col].astype(str), pool, rng)
+        else:
+            survey.loc[redrawn, col] = rng.choice(observed.to_numpy(), size=int(redrawn.sum()))
+    return survey
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic survey with the schema of the real one.")
+    parser.add_argument('n_rows', type=int)
+    parser.add_argument('output_path')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate_survey(args.n_rows, seed=args.seed).to_csv(args.output_path, index=False)
@@ -0,0 +1,59 @@
+"""
+The tiers of benchmarks.survey_scaling as pytest tests, so CI can check the throughput of every stage and key
+function against a baseline recorded on the same machine. Not part of the default test run (see pytest.ini).
+
+Run from the repository root, configured through environment variables:
+    SCALING_SAVE_BASELINE=scaling_baseline.json python -m pytest benchmarks/test_survey_scaling.py
+    SCALING_BASELINE=scaling_baseline.json python -m pytest benchmarks/test_survey_scaling.py
+    SCALING_TIERS="10000" SCALING_TOLERANCE=0.4 SCALING_REPEATS=3 python -m pytest benchmarks/test_survey_scaling.py
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import plots
+from benchmarks.survey_scaling import TIERS, benchmark, regressions, throughputs
+
+SETTINGS = {
+    'tiers': [int(tier) for tier in os.environ.get('SCALING_TIERS', ' '.join(map(str, TIERS))).split()],
+    'baseline': os.environ.get('SCALING_BASELINE'),
+    'save_baseline': os.environ.get('SCALING_SAVE_BASELINE'),
+    'tolerance': float(os.environ.get('SCALING_TOLERANCE', 0.25)),
+    'repeats': int(os.environ.get('SCALING_REPEATS', 1)),
+}
+
+
+@pytest.fixture(scope='module', autouse=True)
+def no_plots():
+    plots.configure('off')
+
+
+def save_baseline(path, results):
+    # Each tier adds its entries to the file, the other tiers' entries are kept
+    baseline = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            baseline = json.load(f)
+    baseline.update(throughputs(results))
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2)
+
+
+@pytest.mark.parametrize('n_rows', SETTINGS['tiers'])
+def test_throughput(n_rows, tmp_path):
+    results = pd.DataFrame(benchmark(n_rows, str(tmp_path), repeats=SETTINGS['repeats']))
+    print(results.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    assert np.isfinite(results['rows_per_s']).all() and (results['rows_per_s'] > 0).all()
+
+    if SETTINGS['save_baseline'] is not None:
+        save_baseline(SETTINGS['save_baseline'], results)
+    if SETTINGS['baseline'] is not None:
+        with open(SETTINGS['baseline']) as f:
+            baseline = json.load(f)
+        missing = [key for key in throughputs(results) if key not in baseline]
+        assert not missing, f"Not in the baseline {SETTINGS['baseline']}: {missing}"
+        failures = regressions(results, baseline, SETTINGS['tolerance'])
+        assert not failures, '\n'.join(failures)
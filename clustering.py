@@ -0,0 +1,173 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from threadpoolctl import threadpool_limits
+
+import profiling
+
+# 'full' is batch KMeans on the whole matrix, 'minibatch' fits MiniBatchKMeans on random batches of rows,
+# which costs far less per iteration on large panels for a slightly higher inertia
+ENGINES = ('full', 'minibatch')
+
+# Float dtypes the estimators run in as they are; float32 halves the memory of the matrices, the distances
+# and the centroids
+FLOAT_DTYPES = (np.float32, np.float64)
+
+# Data shared with the jobs of a worker_pool(), set once per worker process by _init_worker
+worker_state = {}
+
+
+def as_float(values):
+    """
+    values as a float array or CSR matrix (sparse data stays sparse): float32 and float64 are kept,
+    any other dtype (integers, booleans, a DataFrame of mixed dtypes) becomes float64.
+    """
+    if not sp.issparse(values):
+        values = np.asarray(values)
+    dtype = values.dtype if values.dtype in FLOAT_DTYPES else np.float64
+    if sp.issparse(values):
+        return sp.csr_matrix(values, dtype=dtype)
+    return np.asarray(values, dtype=dtype)
+
+
+def densify_if_dense(values, min_density=0.1, max_dense_bytes=512 * 2 ** 20):
+    """
+    values (as_float) as a dense array unless it is truly sparse or too large to densify. On a matrix with more
+    than a few percent of non-zeros, the sparse distance and k-means kernels are several times slower than the
+    dense ones (sparse euclidean_distances is ~5x slower on the 37% dense filtered survey features).
+
+    Parameters:
+    values (array-like or scipy.sparse matrix): Feature matrix.
+    min_density (float): Share of non-zeros from which a sparse matrix is densified.
+    max_dense_bytes (int): Largest dense matrix built, bigger ones stay sparse whatever their density.
+
+    Returns:
+    np.ndarray or scipy.sparse.csr_matrix: values in the layout the clustering runs fastest on.
+    """
+    values = as_float(values)
+    if not sp.issparse(values):
+        return values
+    n_rows, n_cols = values.shape
+    density = values.nnz / max(n_rows * n_cols, 1)
+    if density < min_density or n_rows * n_cols * values.dtype.itemsize > max_dense_bytes:
+        return values
+    return values.toarray()
+
+
+def make_kmeans(n_clusters, engine='full', init=None, random_state=0, batch_size=4096):
+    """
+    Unfitted k-means estimator of the selected engine.
+
+    Parameters:
+    n_clusters (int): Number of clusters.
+    engine (str): 'full' or 'minibatch', see ENGINES.
+    init (np.ndarray): Initial centroids (a single init), None for k-means++.
+    random_state (int): Seed of the k-means++ init and of the mini-batches.
+    batch_size (int): Rows per mini-batch for the 'minibatch' engine.
+
+    Returns:
+    KMeans or MiniBatchKMeans: The estimator, both expose labels_, cluster_centers_ and inertia_ once fitted.
+    """
+    if engine == 'full':
+        if init is None:
+            return KMeans(n_clusters=n_clusters, random_state=random_state)
+        return KMeans(n_clusters=n_clusters, init=init, n_init=1)
+    if engine == 'minibatch':
+        if init is None:
+            return MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, batch_size=batch_size)
+        return MiniBatchKMeans(n_clusters=n_clusters, init=init, n_init=1, random_state=random_state,
+                               batch_size=batch_size)
+    raise ValueError(f"Unknown clustering engine {engine!r}, expected one of {ENGINES}")
+
+
+def stream_kmeans(chunks, n_clusters, n_epochs=3, random_state=0, dtype=np.float64):
+    """
+    Mini-batch k-means over a table that is read in chunks and never held in memory as a whole,
+    e.g. chunks=lambda: artifacts.iter_frame_chunks('processed_data.parquet').
+
+    Every chunk is one MiniBatchKMeans.partial_fit step, for n_epochs passes over the table. A last pass assigns
+    the labels and accumulates the per-cluster sums of every column, so the cluster means come for free.
+    Memory is one chunk plus the labels (one int32 per row).
+
+    Parameters:
+    chunks (callable): Returns a new iterator of pd.DataFrame chunks with the same numeric columns, called once
+                       per pass. The first chunk must have at least n_clusters rows.
+    n_clusters (int): Number of clusters.
+    n_epochs (int): Passes over the table for fitting.
+    random_state (int): Seed of the init and of the updates.
+    dtype (np.dtype): Float dtype the chunks are clustered in, np.float32 for half the memory per chunk.
+
+    Returns:
+    tuple: (fitted MiniBatchKMeans, np.ndarray of labels in row order,
+            pd.DataFrame of the column means per cluster, indexed by cluster).
+    """
+    model = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state)
+    for _ in range(n_epochs):
+        for chunk in chunks():
+            model.partial_fit(chunk.to_numpy(dtype=dtype))
+
+    labels = []
+    sums, counts, columns = 0, np.zeros(n_clusters), None
+    inertia = 0.0
+    for chunk in chunks():
+        values = chunk.to_numpy(dtype=dtype)
+        chunk_labels = model.predict(values)
+        # (k, n) one-hot of the labels times the chunk gives the per-cluster column sums
+        indicator = np.zeros((n_clusters, len(values)))
+        indicator[chunk_labels, np.arange(len(values))] = 1
+        sums = sums + indicator @ values
+        counts += indicator.sum(axis=1)
+        inertia += ((values - model.cluster_centers_[chunk_labels]) ** 2).sum()
+        labels.append(chunk_labels.astype(np.int32))
+        columns = chunk.columns
+
+    model.inertia_ = inertia
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = pd.DataFrame(sums / counts[:, None], columns=columns)
+    means.index.name = 'cluster'
+    return model, np.concatenate(labels), means
+
+
+def _init_worker(shared):
+    worker_state.clear()
+    worker_state.update(shared)
+    # Each worker is one job at a time, so keep KMeans from spawning its own threads on top of the pool
+    threadpool_limits(1)
+    # A forked worker inherits the records and the open sections of the main process
+    profiling.reset_worker()
+
+
+class _InProcess:
+    # The pool of a single worker: the jobs run one after another in the calling process, where the thread limit
+    # (process-wide) and the profiling reset do not apply; the shared data is only set inside the with block
+
+    def __init__(self, shared):
+        self.shared = shared
+
+    def __enter__(self):
+        worker_state.clear()
+        worker_state.update(self.shared)
+        return self
+
+    def __exit__(self, *exc_info):
+        worker_state.clear()
+
+    def map(self, fn, iterable, chunksize=1):
+        return map(fn, iterable)
+
+
+def worker_pool(n_workers, **shared):
+    """
+    Pool of n_workers processes, used as a context manager: the keyword arguments are the data shared with the
+    jobs, in worker_state, set once per worker. Every worker runs KMeans and BLAS single-threaded and starts
+    with no profiling records. With one worker the jobs run in the calling process, without either.
+
+    Returns:
+    concurrent.futures.ProcessPoolExecutor, or an object with the same map() running in this process.
+    """
+    if n_workers > 1:
+        return ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(shared,))
+    return _InProcess(shared)
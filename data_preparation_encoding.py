@@ -1,53 +1,23 @@
+import functools
+import os
+
+import numpy as np
 import pandas as pd
-from fixing_missing_values import data, col_if_yes_diagnosed
-from sklearn.feature_extraction.text import TfidfVectorizer
+import scipy.sparse as sp
+from artifacts import load_frame, save_frame, save_sparse, save_sparse_table
+from encoders import CategoricalEncoder
+from normalization import normalize_answers
+from lazy import lazy_import
+from text_features import TEXT_MODES, hashing_tfidf, top_features, vocabulary_tfidf
+from fixing_missing_values import col_if_yes_diagnosed
 from sklearn.preprocessing import OneHotEncoder, MultiLabelBinarizer
-import nltk
 from collections import Counter
-import matplotlib.pyplot as plt
-
-
-# Ensure NLTK stopwords are available
-nltk.download('stopwords')
-
-# Add columns that represent a mental disorder
-# 1: Clean and split the diagnosis string into lists
-data['diagnosis_list'] = data[col_if_yes_diagnosed].fillna('').apply(
-    lambda x: [i.strip() for i in x.split('|')] if x else []
-)
-
-# 2: Binarize
-mlb = MultiLabelBinarizer()
-diag_encoded_df = pd.DataFrame(
-    mlb.fit_transform(data['diagnosis_list']),
-    columns=mlb.classes_,
-    index=data.index
-)
-
-# Flatten the list of diagnoses and count frequency
-all_diagnoses = [d for sublist in data['diagnosis_list'] for d in sublist]
-diagnosis_counts = Counter(all_diagnoses)
-
-# Convert to lists for plotting
-labels, values = zip(*diagnosis_counts.most_common())
+import plots
+import profiling
 
+# Only needed for the plots, imported when the first plot is drawn
+plt = lazy_import('matplotlib.pyplot')
 
-# Plot 'Most common mental health issues'.
-#
-plt.figure(figsize=(12, 6))
-plt.bar(labels, values)
-plt.xticks(rotation=90, fontsize=12)
-plt.ylabel("Frequency")
-plt.title("Most Common Mental Health Issues")
-plt.tight_layout()
-plt.show()
-
-
-# 3: Add the new diagnosis columns
-data = pd.concat([data, diag_encoded_df], axis=1)
-
-# 4: Drop helper columns
-data.drop(columns=['diagnosis_list', col_if_yes_diagnosed], inplace=True)
 
 # ----- Define TF-IDF text processing function -----
 custom_stop_words = {
@@ -57,427 +27,57 @@ custom_stop_words = {
     'health', 'even', 'though', 'interview', 'much', 'still', 'employer'
 }
 
-all_stop_words = set(nltk.corpus.stopwords.words('english')).union(custom_stop_words)
-
 max_words = 100
 
-def process_and_align_text(column, prefix, original_data):
+# NLTK's English stopword list, vendored so that no corpus download or network access is needed
+STOP_WORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'stopwords_english.txt')
+
+
+@functools.lru_cache(maxsize=None)
+def stop_words():
+    """
+    English stopwords plus custom_stop_words, read from STOP_WORDS_PATH on first use and built once per process.
+    """
+    with open(STOP_WORDS_PATH, encoding='utf-8') as f:
+        english = [line.strip() for line in f if line.strip()]
+    return frozenset(english).union(custom_stop_words)
+
+
+def process_and_align_text(column, prefix, original_data, stop_words, mode='vocabulary', n_features=2 ** 18,
+                           chunk_size=10_000):
+    """
+    TF-IDF features of a free-text column, one row per row of original_data. Texts that are "no response",
+    "i dont know" or longer than max_words words get an empty row.
+
+    Parameters:
+    mode (str): 'vocabulary' for a fitted n-gram vocabulary (readable columns) or 'hashing' for hashed
+                n-grams with a fixed number of columns, computed in chunks (see text_features.HashingTfidf).
+    n_features (int): Number of columns in 'hashing' mode.
+    chunk_size (int): Texts per chunk in 'hashing' mode.
+
+    Returns:
+    tuple: (scipy.sparse.csr_matrix, list of column names or None in 'hashing' mode).
+    """
     # Clean text: remove "no response" and "i dont know"
     filtered = column[~column.isin(["no response", "i dont know"])]
-    filtered = filtered[filtered.str.split().str.len().le(max_words)].reset_index(drop=True)
+    filtered = filtered[filtered.str.split().str.len().le(max_words)]
 
     # Vectorize text using TF-IDF
-    vectorizer = TfidfVectorizer(
-        lowercase=False,
-        stop_words=list(all_stop_words),
-        token_pattern=r'(?u)\b\w[\w-]+\b',
-        # max_df=0.95,
-        # min_df=0.005,
-        ngram_range=(3, 4)
-    )
-    tfidf = vectorizer.fit_transform(filtered)
-    tfidf_df = pd.DataFrame(tfidf.toarray(), columns=[f"{prefix}{feat}" for feat in vectorizer.get_feature_names_out()])
-
-    # Align TF-IDF with original data
-    aligned_df = pd.DataFrame(0.0, index=original_data.index, columns=tfidf_df.columns)
-    aligned_df.iloc[:len(filtered), :] = tfidf_df.values
-    return aligned_df
-
-
-# ----- Process and integrate text columns -----
-# Mental health
-mental_col = 'Why or why not bring up with a potential employer in an interview(mental health issue)_cleaned?'
-tfidf_mental = process_and_align_text(data[mental_col], 'MH_TFIDF_', data)
-
-# 1: Get the mean TF-IDF score per feature
-tfidf_means = tfidf_mental.mean().sort_values(ascending=False)
-
-# 2: Plot the top features in mental health comments
-top_n = 20
-plt.figure(figsize=(10, 6))
-tfidf_means.head(top_n).plot(kind='barh')
-plt.gca().invert_yaxis()
-plt.title('Top TF-IDF Features in Mental Health Comments')
-plt.xlabel('Mean TF-IDF Score')
-plt.tight_layout()
-plt.show()
-
-data = data.drop(columns=[mental_col])
-
-
-# Physical health
-physical_col = 'Why or why not bring up with a potential employer in an interview(physical health issue)_cleaned?'
-tfidf_physical = process_and_align_text(data[physical_col], 'PH_TFIDF_', data)
-
-tfidf_means = tfidf_physical.mean().sort_values(ascending=False)
-# Plot the top features in physical health comments
-top_n = 20
-plt.figure(figsize=(10, 6))
-tfidf_means.head(top_n).plot(kind='barh')
-plt.gca().invert_yaxis()
-plt.title('Top TF-IDF Features in Physical Health Comments')
-plt.xlabel('Mean TF-IDF Score')
-plt.tight_layout()
-plt.show()
-
-
-data = data.drop(columns=[physical_col])
-
-# Replace "Maybe" with "I don't know" only in object columns
-data.loc[:, data.select_dtypes(include=['object']).columns] = data.select_dtypes(include=['object']).replace("Maybe",
-                                                                                                             "I don't know")
-data['Do you feel that being identified as a person with a mental health issue would hurt your career?'] = data[
-    ('Do you feel that being identified as a person with a mental health issue would hurt your career?')].replace({
-    "No, I don't think it would": "No",
-    'No, it has not': "No",
-    'Yes, I think it would': "Yes",
-    'Yes, it has': "Yes"
-})
-
-data[
-    ('Do you think that team members/co-workers would view you more negatively if they knew you suffered from a mental '
-     'health issue?')] = \
-    data[
-        ('Do you think that team members/co-workers would view you more negatively if they knew you suffered from a '
-         'mental health issue?')].replace(
-        {
-            "No, I don't think they would": "No",
-            'Yes, I think they would': "Yes",
-            'Yes, they do': "Yes",
-            'No, they do not': "No"
-        })
-data[
-    ('Have you observed or experienced an unsupportive or badly handled response to a mental health issue in your '
-     'current or previous workplace?')] = \
-    data[
-        ('Have you observed or experienced an unsupportive or badly handled response to a mental health issue in your '
-         'current or previous workplace?')].replace(
-        {
-            "Maybe/Not sure": "A",
-            "Yes, I experienced": "Yes",
-            "Yes, I observed": "Yes",
-            "No response":"A"
-        })
-data[
-    ('If a mental health issue prompted you to request a medical leave from work, asking for that leave would be:')]=\
-data [
-     ('If a mental health issue prompted you to request a medical leave from work, asking for that leave would be:')].replace(
-        {
-            "Very easy": "Easy",
-            "Somewhat easy": "Easy",
-            "Somewhat difficult":"Difficult",
-            "Very difficult": "Difficult",
-            "Neither easy nor difficult":"A",
-            "I don't know":"A",
-            "Not applicable":"A"
-        }
-     )
-
-data['How willing would you be to share with friends and family that you have a mental illness?'] = data[
-    'How willing would you be to share with friends and family that you have a mental illness?'].replace({
-    'Very open': 'Open', 'Somewhat open': 'Open', 'Neutral': 'NA', 'Somewhat not open': 'Not open',
-    'Not open at all': 'Not open', 'Not applicable to me (I do not have a mental illness)': 'NA'
-})
-
-data[
-    ('Have your previous employers provided mental health benefits?')]=\
-data [
-     ('Have your previous employers provided mental health benefits?')].replace(
-        {
-            "No, none did": "No",
-            "Yes, they all did": "Yes",
-            "Some did":"Yes",
-            "I don't know": "NA",
-            "No previous employer":"NA"
-        }
-     )
-
-data[
-    ('Did your previous employers ever formally discuss mental health (as part of a wellness campaign or other official communication)?')]=\
-data [
-     ('Did your previous employers ever formally discuss mental health (as part of a wellness campaign or other official communication)?')].replace(
-        {
-            "None did": "No",
-            "Some did": "Yes",
-            "I don't know": "NA",
-            "No previous employer":"NA",
-            "Yes, they all did":"Yes"
-        }
-     )
-
-
-data[
-    ('Do you think that discussing a mental health disorder with your employer would have negative consequences?')]=\
-data [
-     ('Do you think that discussing a mental health disorder with your employer would have negative consequences?')].replace(
-        {   "Some of them":"Yes",
-            "None of them":"No",
-            "I don't know":"A",
-            "Yes, all of them":"Yes",
-            "No previous employer":"A",
-            "Not applicable":"A"
-        }
-     )
-
-
-data[
-    ('Do you think that discussing a mental health disorder with previous employers would have negative consequences?')]=\
-data [
-     ('Do you think that discussing a mental health disorder with previous employers would have negative consequences?')].replace(
-        {
-            "Some of them":"Yes",
-            "None of them":"No",
-            "I don't know":"A",
-            "Yes, all of them":"Yes",
-            "No previous employer":"A"
-        }
-     )
-
-
-
-# Map "Yes" to 1 and "No" to 0
-data['Have you been diagnosed with a mental health condition by a medical professional?'] = data[
-    'Have you been diagnosed with a mental health condition by a medical professional?'].map({'Yes': 1, 'No': 0})
-
-country_mapping = {'United Kingdom': 'Europe', 'Germany': 'Europe', 'Netherlands': 'Europe',
-                   'Czech Republic': 'Europe', 'Lithuania': 'Europe', 'France': 'Europe',
-                   'Poland': 'Europe', 'Belgium': 'Europe', 'Denmark': 'Europe', 'Sweden': 'Europe',
-                   'Russia': 'Europe', 'Spain': 'Europe', 'Norway': 'Europe', 'Ireland': 'Europe',
-                   'Italy': 'Europe', 'Finland': 'Europe', 'Slovakia': 'Europe', 'Austria': 'Europe',
-                   'Greece': 'Europe', 'Romania': 'Europe', 'Hungary': 'Europe', 'Estonia': 'Europe',
-                   'Bosnia and Herzegovina': 'Europe', 'Bulgaria': 'Europe', 'Serbia': 'Europe',
-                   'United States of America': 'North America', 'Canada': 'North America',
-                   'Mexico': 'North America', 'Costa Rica': 'North America', 'Guatemala': 'North America',
-                   'India': 'Asia', 'Vietnam': 'Asia', 'Pakistan': 'Asia', 'Afghanistan': 'Asia',
-                   'Iran': 'Asia', 'Israel': 'Asia', 'Taiwan': 'Asia', 'Japan': 'Asia', 'Bangladesh': 'Asia',
-                   'Brunei': 'Asia', 'China': 'Asia',
-                   'Brazil': 'South America', 'Venezuela': 'South America', 'Argentina': 'South America',
-                   'Colombia': 'South America', 'Chile': 'South America', 'Ecuador': 'South America',
-                   'Australia': 'Oceania', 'New Zealand': 'Oceania',
-                   'South Africa': 'Africa', 'Algeria': 'Africa', 'United Arab Emirates': 'Asia',
-                   'Switzerland': 'Europe', 'Turkey': 'Asia'}
-
-data['What country do you live in?'] = data['What country do you live in?'].replace(country_mapping)
-data['What country do you work in?'] = data['What country do you work in?'].replace(country_mapping)
-
-data[
-    ('Was your anonymity protected if you chose to take advantage of mental health or substance abuse treatment '
-     'resources with previous employers?')]=\
-data [
-     ('Was your anonymity protected if you chose to take advantage of mental health or substance abuse treatment '
-     'resources with previous employers?')].replace(
-        {
-            "Yes, always":"Yes",
-            "Sometimes":"Yes",
-            "I don't know":"A",
-            "No":"No",
-            "No previous employer":"A"
-        }
-     )
-
-data[
-    ('Did you feel that your previous employers took mental health as seriously as physical health?')]=\
-data [
-     ('Did you feel that your previous employers took mental health as seriously as physical health?')].replace(
-        {
-            "I don't know":"A",
-            "Some did":"Yes",
-            "None did":"No",
-            "Yes, they all did":"Yes",
-            "No previous employer":"A"
-        }
-     )
-
-
-
-data[
-    ('If you have a mental health issue, do you feel that it interferes with your work when being treated effectively?')]=\
-data [
-     ('If you have a mental health issue, do you feel that it interferes with your work when being treated effectively?')].replace(
-        {
-            "Not applicable to me":"A",
-            "Rarely":"Yes",
-            "Sometimes":"Yes",
-            "Never":"No",
-            "Often":"Yes"
-        }
-     )
-
-data[
-    ('If you have a mental health issue, do you feel that it interferes with your work when NOT being treated effectively?')]=\
-data [
-     ('If you have a mental health issue, do you feel that it interferes with your work when NOT being treated effectively?')].replace(
-        {
-            "Not applicable to me":"A",
-            "Rarely":"Yes",
-            "Sometimes":"Yes",
-            "Never":"No",
-            "Often":"Yes"
-        }
-     )
-
-data[
-    ('Do you feel that your employer takes mental health as seriously as physical health?')]=\
-data [
-     ('Do you feel that your employer takes mental health as seriously as physical health?')].replace(
-        {
-            "No":"No",
-            "Yes":"Yes",
-            "Not applicable":"A",
-            "I don't know":"A"
-        }
-     )
-
-data[
-    ('Is your anonymity protected if you choose to take advantage of mental health or substance abuse treatment '
-     'resources provided by your employer?')]=\
-data [
-     ('Is your anonymity protected if you choose to take advantage of mental health or substance abuse treatment '
-     'resources provided by your employer?')].replace(
-        {
-            "No":"No",
-            "Yes":"Yes",
-            "Not applicable":"A",
-            "I don't know":"A"
-        }
-     )
-
-data[
-    ('Does your employer offer resources to learn more about mental health concerns and options for seeking help?')]=\
-data [
-     ('Does your employer offer resources to learn more about mental health concerns and options for seeking help?')].replace(
-        {
-            "No":"No",
-            "Yes":"Yes",
-            "Not applicable":"A",
-            "I don't know":"A"
-        }
-     )
-data[
-    ('Has your employer ever formally discussed mental health (for example, as part of a wellness campaign or other '
-     'official communication)?')]=\
-data [
-     ('Has your employer ever formally discussed mental health (for example, as part of a wellness campaign or other '
-     'official communication)?')].replace(
-        {
-            "No":"No",
-            "Yes":"Yes",
-            "Not applicable":"A",
-            "I don't know":"A"
-        }
-     )
-
-data[
-    ('Did your previous employers provide resources to learn more about mental health issues and how to seek help?')]=\
-data [
-     ('Did your previous employers provide resources to learn more about mental health issues and how to seek help?')].replace(
-        {
-            "Non did":"No",
-            "Some did":"Yes",
-            "No previous employer":"A",
-            "Yes, they all did":"Yes"
-        }
-     )
-
-data[
-    ('Have your observations of how another individual who discussed a mental health disorder made you less likely to reveal a mental health issue yourself in your current workplace?')]=\
-data [
-     ('Have your observations of how another individual who discussed a mental health disorder made you less likely to reveal a mental health issue yourself in your current workplace?')].replace(
-        {
-            "No response":"A",
-            "Yes":"Yes",
-            "No":"No",
-            "I don't know":"A"
-        }
-     )
-
-data[
-    ('Were you aware of the options for mental health care provided by your previous employers?')]=\
-data [
-     ('Were you aware of the options for mental health care provided by your previous employers?')].replace(
-        {
-            "Not Aware":"No",
-            "Aware":"Yes",
-            "No History":"A",
-        }
-     )
-
-data[
-    ('Do you think that discussing a physical health issue with previous employers would have negative consequences?')]=\
-data [
-     ('Do you think that discussing a physical health issue with previous employers would have negative consequences?')].replace(
-        {
-            "None of them":"No",
-            "Some of them":"Yes",
-            "Yes, all of them":"Yes",
-            "No previous employer":"A"
-        }
-     )
-
-data[
-    ('Would you feel comfortable discussing a mental health disorder with your coworkers?')]=\
-data [
-     ('Would you feel comfortable discussing a mental health disorder with your coworkers?')].replace(
-        {
-            "No":"No",
-            "Not applicable":"A",
-            "I don't know":"A",
-            "Yes":"Yes"
-        }
-     )
-
-
-
-data[
-    ('Do you think that discussing a physical health issue with your employer would have negative consequences?')]=\
-data [
-     ('Do you think that discussing a physical health issue with your employer would have negative consequences?')].replace(
-        {
-            "No":"No",
-            "Not applicable":"A",
-            "I don't know":"A",
-            "Yes":"Yes"
-        }
-     )
-
-
-
-data[
-    ('Did your previous employers provide resources to learn more about mental health issues and how to seek help?')]=\
-data [
-     ('Did your previous employers provide resources to learn more about mental health issues and how to seek help?')].replace(
-        {
-            "None did":"No",
-            "Some did":"Yes",
-            "No previous employer":"A",
-            "Yes, all of them":"Yes"
-        }
-     )
-
-data[
-    ('Did you hear of or observe negative consequences for co-workers with mental health issues in your previous workplaces?')]=\
-data [
-     ('Did you hear of or observe negative consequences for co-workers with mental health issues in your previous workplaces?')].replace(
-        {
-            "None of them":"No",
-            "Some of them":"Yes",
-            "No previous workplace":"A",
-            "Yes, all of them":"Yes"
-        }
-     )
-
-
-data[
-    ("Would you feel comfortable discussing a mental health disorder with your direct supervisor(s)?")]=\
-data [
-     ("Would you feel comfortable discussing a mental health disorder with your direct supervisor(s)?")].replace(
-        {
-            "Yes":"Yes",
-            "I don't know":"A",
-            "Not applicable":"A",
-            "No":"No"
-        }
-     )
+    with profiling.section('encode.tfidf', filtered) as timing:
+        if mode == 'vocabulary':
+            tfidf, names = vocabulary_tfidf(filtered, prefix, stop_words)
+        elif mode == 'hashing':
+            tfidf, names = hashing_tfidf(filtered, stop_words, n_features=n_features, chunk_size=chunk_size), None
+        else:
+            raise ValueError(f"Unknown text mode {mode!r}, expected one of {TEXT_MODES}")
+        timing.output(tfidf)
+
+    # Align TF-IDF with original data: scatter every row back to the position of its respondent,
+    # the respondents whose text was filtered out get empty rows
+    positions = original_data.index.get_indexer(filtered.index)
+    scatter = sp.csr_matrix((np.ones(len(positions)), (positions, np.arange(len(positions)))),
+                            shape=(len(original_data), len(positions)))
+    return (scatter @ tfidf).tocsr(), names
 
 
 columns_drop_first_true = \
@@ -520,11 +120,19 @@ columns_drop_first_true = \
 
      ]
 
+
 columns_drop_first_false = [
                             'What is your gender?', 'What country do you live in?', 'What country do you work in?',
                             'Do you work remotely?', 'How many employees does your company or organization have?']
 
 
+def categorical_encoder(columns_drop_first_true, columns_drop_first_false):
+    # Unfitted encoder for the answer columns, in the order they are encoded
+    drop_first = {col: True for col in columns_drop_first_true}
+    drop_first.update({col: False for col in columns_drop_first_false if col not in drop_first})
+    return CategoricalEncoder(drop_first)
+
+
 # Combined function to handle both encoding scenarios
 def one_hot_encode_columns(df, columns_drop_first_true, columns_drop_first_false):
     """
@@ -538,39 +146,47 @@ def one_hot_encode_columns(df, columns_drop_first_true, columns_drop_first_false
     Returns:
     pd.DataFrame: A DataFrame with the specified columns one-hot encoded as integers.
     """
-    encoded_df = df.copy()
-
-    for col in columns_drop_first_true + columns_drop_first_false:
-        # Check if the column exists in the DataFrame
-        if col not in encoded_df.columns:
-            continue
+    encoder = categorical_encoder(columns_drop_first_true, columns_drop_first_false).fit(df)
+    # All encoded columns are written into one block and joined once, instead of a concat per column
+    dummies = encoder.transform_dense(df, dtype=int)
+    return pd.concat([df.drop(columns=encoder.columns_), dummies], axis=1)
 
-        # Determine if drop_first should be True or False
-        drop_first = col in columns_drop_first_true
 
-        # Dynamically find the unique values to order categories correctly
-        unique_values = sorted(encoded_df[col].dropna().unique())
-        if 'Not applicable' in unique_values:
-            unique_values = ['Not applicable'] + [v for v in unique_values if v != 'Not applicable']
+def plot_diagnosis_counts(labels, values):
+    plt.figure(figsize=(12, 6))
+    plt.bar(labels, values)
+    plt.xticks(rotation=90, fontsize=12)
+    plt.ylabel("Frequency")
+    plt.title("Most Common Mental Health Issues")
+    plt.tight_layout()
 
-        # Set the order of categories dynamically
-        encoded_df[col] = pd.Categorical(encoded_df[col], categories=unique_values, ordered=True)
 
-        # Generate One-Hot Encoded DataFrame with integer type (0 or 1)
-        prefix = col[:150].replace(' ', '_')  # Shortened prefix to avoid long column names
-        dummies = pd.get_dummies(encoded_df[col], prefix=prefix, drop_first=drop_first).astype(int)
+def plot_top_features(tfidf_means, title):
+    # Mean TF-IDF score of the top features, highest first
+    plt.figure(figsize=(10, 6))
+    tfidf_means.plot(kind='barh')
+    plt.gca().invert_yaxis()
+    plt.title(title)
+    plt.xlabel('Mean TF-IDF Score')
+    plt.tight_layout()
 
-        # Concatenate the encoded columns and drop the original column
-        encoded_df = pd.concat([encoded_df, dummies], axis=1).drop(columns=[col])
-
-    return encoded_df
 
+def condition_labels(column):
+    """
+    Condition lists of a normalized diagnosis column (see fixing_missing_values.normalize_conditions),
+    split once per distinct answer.
 
-# Apply the function to both lists of columns
-encoded_data = one_hot_encode_columns(data, columns_drop_first_true, columns_drop_first_false)
+    Returns:
+    tuple: (codes, conditions) where conditions is a list of condition lists, one per distinct answer,
+           and codes gives the index into it of every row. Missing and empty answers have no conditions.
+    """
+    codes, uniques = pd.factorize(column)
+    conditions = [[cond.strip() for cond in answer.split('|')] if answer else [] for answer in uniques]
+    # Missing answers point to an extra empty list at the end
+    codes = np.where(codes < 0, len(conditions), codes)
+    conditions.append([])
+    return codes, conditions
 
-# Replace the original DataFrame with the encoded one
-data = encoded_data
 
 bin_columns = ['Have you been diagnosed with a mental health condition by a medical professional?',
                'Are you self-employed?', 'Is your employer primarily a tech company/organization?',
@@ -578,28 +194,126 @@ bin_columns = ['Have you been diagnosed with a mental health condition by a medi
                'Have you ever sought treatment for a mental health issue from a mental health professional?',
                'Inferred Tech Role']
 
-# Initialize the encoder
-encoder = OneHotEncoder(drop='first', sparse_output=False)
 
-# Fit and transform the data
-one_hot_encoded = encoder.fit_transform(data[bin_columns])
+def encode(cleaned_df, text_mode='vocabulary'):
+    """
+    Encodes the cleaned survey into the numeric feature matrix used for clustering.
+
+    Parameters:
+    cleaned_df (pd.DataFrame): Output of fixing_missing_values.clean(). It is not modified.
+    text_mode (str): TF-IDF mode of the interview free-text, 'vocabulary' or 'hashing' (see process_and_align_text).
+
+    Returns:
+    tuple: (scipy.sparse.csr_matrix of the features, list of column names).
+    """
+    data = cleaned_df.copy()
+
+    # Add columns that represent a mental disorder
+    # 1: Split every distinct diagnosis answer into its conditions
+    codes, conditions = condition_labels(data[col_if_yes_diagnosed])
+
+    # 2: Binarize the distinct answers, as a sparse block, and spread the rows back over the respondents
+    with profiling.section('encode.diagnoses', codes) as timing:
+        mlb = MultiLabelBinarizer(sparse_output=True)
+        diag_matrix = timing.output(mlb.fit_transform(conditions)[codes])
+
+    # Count the frequency of every diagnosis, each distinct answer weighted by its number of respondents,
+    # and plot 'Most common mental health issues'
+    if plots.enabled():
+        diagnosis_counts = Counter()
+        for cell_conditions, n_rows in zip(conditions, np.bincount(codes, minlength=len(conditions))):
+            for condition in cell_conditions:
+                diagnosis_counts[condition] += n_rows
+
+        # Convert to lists for plotting
+        labels, values = zip(*diagnosis_counts.most_common())
+        plots.render('diagnosis_counts', plot_diagnosis_counts, labels, values)
+
+
+    # 3: Drop the diagnosis column, the diagnosis block is added when the feature matrix is assembled
+    data.drop(columns=[col_if_yes_diagnosed], inplace=True)
+
+
+    # ----- Process and plot the text columns -----
+    # The TF-IDF features are only plotted, so they are not computed when plots are off
+    mental_col = 'Why or why not bring up with a potential employer in an interview(mental health issue)_cleaned?'
+    physical_col = 'Why or why not bring up with a potential employer in an interview(physical health issue)_cleaned?'
+    if plots.enabled():
+        all_stop_words = stop_words()
+        top_n = 20
+
+        # Mental health
+        tfidf_mental, mental_names = process_and_align_text(data[mental_col], 'MH_TFIDF_', data, all_stop_words,
+                                                            mode=text_mode)
+        # Plot the top features in mental health comments
+        plots.render('tfidf_mental', plot_top_features,
+                     top_features(tfidf_mental, mental_names, 'MH_TFIDF_', top_n),
+                     'Top TF-IDF Features in Mental Health Comments')
+
+        # Physical health
+        tfidf_physical, physical_names = process_and_align_text(data[physical_col], 'PH_TFIDF_', data,
+                                                                all_stop_words, mode=text_mode)
+        # Plot the top features in physical health comments
+        plots.render('tfidf_physical', plot_top_features,
+                     top_features(tfidf_physical, physical_names, 'PH_TFIDF_', top_n),
+                     'Top TF-IDF Features in Physical Health Comments')
+
+    data = data.drop(columns=[mental_col, physical_col])
+
+    # Normalize the answers ("Maybe" -> "I don't know", grouped answers, countries to continents), see normalization.py
+    normalize_answers(data)
+
+    # Map "Yes" to 1 and "No" to 0
+    data['Have you been diagnosed with a mental health condition by a medical professional?'] = data[
+        'Have you been diagnosed with a mental health condition by a medical professional?'].map({'Yes': 1, 'No': 0})
+
+
+    # Assemble the feature matrix from sparse blocks without densifying any of them:
+    # the remaining numeric columns, the diagnoses, the one-hot encoded answers and the binary answers
+    with profiling.section('encode.one_hot', data) as timing:
+        answers = categorical_encoder(columns_drop_first_true, columns_drop_first_false).fit(data)
+        numeric_columns = [col for col in data.columns if col not in answers.columns_ and col not in bin_columns]
+        blocks = [sp.csr_matrix(data[numeric_columns].to_numpy(dtype=np.float64)), diag_matrix,
+                  answers.transform(data)]
+        feature_names = numeric_columns + list(mlb.classes_) + answers.feature_names_
+
+        encoder = OneHotEncoder(drop='first', sparse_output=True)
+        blocks.append(encoder.fit_transform(data[bin_columns]))
+        feature_names += list(encoder.get_feature_names_out(bin_columns))
+        timing.output(blocks[2])
+
+    return sp.hstack(blocks, format='csr', dtype=np.float64), feature_names
+
+
+def load_cleaned(input_path='cleaned_data.parquet'):
+    # 'Inferred Tech Role' is a nullable integer column, keep it that way so its encoded name stays '_1.0'
+    # (only CSV loses it, Parquet and Arrow keep the dtype)
+    return load_frame(input_path, dtype={'Inferred Tech Role': 'Int64'})
 
-# Convert the encoded data to a DataFrame
-one_hot_encoded_df = pd.DataFrame(one_hot_encoded, columns=encoder.get_feature_names_out(bin_columns))
 
-# Concatenate with the original data
-data = pd.concat([data, one_hot_encoded_df], axis=1)
+def run(input_path='cleaned_data.parquet', output_path='processed_data.npz',
+        dense_output_path='processed_data.parquet', text_mode='vocabulary', dtype='float64', data=None,
+        plot_mode=None, plot_dir='plots'):
+    # Figures in the mode the pipeline passed in, which is part of the stage's parameters: a run with another
+    # mode re-runs the stage instead of skipping it without figures
+    if plot_mode is not None:
+        plots.configure(plot_mode, plot_dir)
 
-# Drop the original binary columns after encoding
-data = data.drop(columns=bin_columns)
-data['Inferred Tech Role_1.0'] = data['Inferred Tech Role_1.0'].astype(int)
-data['Have you ever sought treatment for a mental health issue from a mental health professional?_1'] = data['Have you ever sought treatment for a mental health issue from a mental health professional?_1'].astype(int)
-data['Do you have previous employers?_1'] = data['Do you have previous employers?_1'].astype(int)
-data['Is your employer primarily a tech company/organization?_1'] = data['Is your employer primarily a tech company/organization?_1'].astype(int)
-data['Are you self-employed?_1'] = data['Are you self-employed?_1'].astype(int)
-data['Have you been diagnosed with a mental health condition by a medical professional?_1'] = data['Have you been diagnosed with a mental health condition by a medical professional?_1'].astype(int)
+    # Use the cleaned frame handed over by the pipeline, or the cached artifact when run on its own
+    if data is None:
+        data = load_cleaned(input_path)
 
+    # The clustering runs in the dtype the matrix is stored in, float32 halves its working set
+    matrix, columns = encode(data, text_mode=text_mode)
+    matrix = matrix.astype(dtype, copy=False)
+    save_sparse(matrix, columns, output_path)
 
+    # Dense copy of the same features for inspection and CSV export, with uint8 indicator columns
+    if dense_output_path is not None:
+        save_sparse_table(matrix, columns, dense_output_path)
+
+    return matrix, columns
 
-data.to_csv("processed_data.csv", index=False)
 
+if __name__ == '__main__':
+    run()
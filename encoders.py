@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+def category_order(column):
+    # Sorted answers, with 'Not applicable' always first so that drop_first drops it
+    categories = sorted(column.dropna().unique())
+    if 'Not applicable' in categories:
+        categories = ['Not applicable'] + [v for v in categories if v != 'Not applicable']
+    return categories
+
+
+class CategoricalEncoder:
+    """
+    One-hot encoder for many categorical columns at once.
+
+    fit() learns the category order of every column (sorted, 'Not applicable' first) and the layout of the
+    encoded block. transform() then writes all columns into one preallocated matrix, so the cost is one pass
+    over the data instead of one copy of the growing frame per column. The fitted encoder can be reused on
+    other frames with the same columns, unseen answers encode as all zeros.
+
+    Parameters:
+    drop_first (dict): Column name -> whether its first category is dropped. Columns are encoded in this order.
+
+    Attributes (after fit):
+    columns_ (list): The encoded columns, those of drop_first that were present in the fitted frame.
+    categories_ (dict): Column name -> list of its categories, in encoding order.
+    offsets_ (np.ndarray): Position of the first output column of every encoded column.
+    feature_names_ (list): Names of the output columns, '<prefix>_<category>'.
+    """
+
+    def __init__(self, drop_first):
+        self.drop_first = dict(drop_first)
+
+    def fit(self, df):
+        self.columns_ = [col for col in self.drop_first if col in df.columns]
+        self.categories_ = {col: category_order(df[col]) for col in self.columns_}
+
+        self.feature_names_ = []
+        offsets = []
+        for col in self.columns_:
+            offsets.append(len(self.feature_names_))
+            prefix = col[:150].replace(' ', '_')  # Shortened prefix to avoid long column names
+            categories = self.categories_[col][1:] if self.drop_first[col] else self.categories_[col]
+            self.feature_names_ += [f"{prefix}_{value}" for value in categories]
+        self.offsets_ = np.array(offsets, dtype=np.int64)
+        return self
+
+    def _output_columns(self, df):
+        # (rows, encoded columns) matrix of output column positions, -1 for missing, dropped or unseen answers
+        positions = np.empty((len(df), len(self.columns_)), dtype=np.int64)
+        for j, col in enumerate(self.columns_):
+            # Hash every cell once, then map its few distinct answers to their output column
+            codes, uniques = pd.factorize(df[col])
+            first = 1 if self.drop_first[col] else 0
+            position = {value: self.offsets_[j] + i - first for i, value in enumerate(self.categories_[col])
+                        if i >= first}
+            # The extra last entry is picked by the -1 code of missing answers
+            lookup = np.array([position.get(value, -1) for value in uniques] + [-1], dtype=np.int64)
+            positions[:, j] = lookup[codes]
+        return positions
+
+    def transform(self, df, dtype=np.uint8):
+        """
+        Encodes the fitted columns of df.
+
+        Returns:
+        scipy.sparse.csr_matrix: (rows, len(feature_names_)) matrix of 0/1 values.
+        """
+        positions = self._output_columns(df)
+        valid = positions >= 0
+        # At most one non-zero per row and encoded column, in row-major order, so the CSR arrays are built directly
+        indptr = np.concatenate([[0], np.cumsum(valid.sum(axis=1))])
+        indices = positions[valid]
+        data = np.ones(len(indices), dtype=dtype)
+        return sp.csr_matrix((data, indices, indptr), shape=(len(df), len(self.feature_names_)))
+
+    def transform_dense(self, df, dtype=np.uint8):
+        """
+        Encodes the fitted columns of df into a DataFrame with the same index as df.
+        """
+        positions = self._output_columns(df)
+        rows, cols = np.nonzero(positions >= 0)
+        values = np.zeros((len(df), len(self.feature_names_)), dtype=dtype)
+        values[rows, positions[rows, cols]] = 1
+        return pd.DataFrame(values, index=df.index, columns=self.feature_names_)
+
+    def fit_transform(self, df, dtype=np.uint8):
+        return self.fit(df).transform(df, dtype=dtype)
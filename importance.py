@@ -0,0 +1,169 @@
+import os
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from clustering import as_float, make_kmeans, worker_pool, worker_state
+from ksweep import fit_kmeans
+import profiling
+from memo import fingerprint, memoized
+from result_cache import cache_key, code_version
+from silhouette import silhouette_score
+
+
+def _fit_score(values, n_clusters, init, silhouette_options, engine='full'):
+    # With init, warm start from the baseline centroids, a single run is enough
+    model = make_kmeans(n_clusters, engine=engine, init=init)
+    with profiling.section('permutation_fit', values) as timing:
+        labels = timing.output(model.fit_predict(values))
+    return silhouette_score(values, labels, centers=model.cluster_centers_, **silhouette_options)
+
+
+def _permute_column(values, col_idx, permutation):
+    if not sp.issparse(values):
+        values = values.copy()
+        values[:, col_idx] = values[permutation, col_idx]
+        return values
+
+    # Sparse data is kept in CSC form: permuting a column only moves the row indices of its non-zeros
+    permuted = values.copy()
+    start, end = values.indptr[col_idx], values.indptr[col_idx + 1]
+    inverse = np.empty_like(permutation)
+    inverse[permutation] = np.arange(len(permutation))
+    permuted.indices[start:end] = inverse[values.indices[start:end]]
+    permuted.has_sorted_indices = False
+    permuted.sort_indices()
+    return permuted.tocsr()
+
+
+def _score_permutation(job):
+    seed, col_idx, permutation = job
+    values = _permute_column(worker_state['values'], col_idx, permutation)
+    score = _fit_score(values, worker_state['n_clusters'], worker_state['init'], worker_state['silhouette_options'],
+                       worker_state['engine'])
+    # The timings of a worker process travel back with its results
+    return seed, col_idx, score, profiling.worker_records()
+
+
+def baseline_clustering(values, n_clusters, silhouette_options, distances=None, engine='full'):
+    """
+    k-means fit (of the clustering.ENGINES engine) and silhouette score of the unpermuted data, computed once
+    per dataset and reused by every later call on the same data. `distances` is an optional precomputed
+    silhouette.distance_matrix(values).
+    """
+    def compute():
+        model = fit_kmeans(values, n_clusters, engine)
+        score = silhouette_score(values, model.labels_, centers=model.cluster_centers_, distances=distances,
+                                 **silhouette_options)
+        return model, score
+
+    return memoized('baseline', values, compute, n_clusters, tuple(sorted(silhouette_options.items())), engine)
+
+
+def _draw_permutations(n_rows, n_cols, seed, n_repeats):
+    # Drawn column by column from one generator per seed, exactly like the original serial loop,
+    # so results do not depend on how the jobs are scheduled
+    rng = np.random.default_rng(seed)
+    return [[rng.permutation(n_rows) for _ in range(n_repeats)] for _ in range(n_cols)]
+
+
+def _is_confident(drops, z):
+    mean = np.mean(drops)
+    half_width = z * np.std(drops, ddof=1) / np.sqrt(len(drops))
+    return mean - half_width > 0 or mean + half_width < 0
+
+
+def permutation_importance(data, seeds, n_clusters=3, n_workers=None, warm_start=False, n_repeats=1,
+                           early_stopping=True, min_repeats=3, z=1.96, silhouette_options=None, columns=None,
+                           engine='full', cache=None):
+    """
+    Permutation feature importance of every column for the KMeans silhouette score.
+
+    Each (seed, column, repeat) permutation is an independent KMeans refit and silhouette score,
+    and the jobs are spread over a process pool. With n_repeats=1 the result for a seed is the
+    same as permuting the columns one after another with np.random.default_rng(seed).
+
+    Parameters:
+    data (pd.DataFrame or scipy.sparse matrix): Feature matrix to cluster. Sparse data stays sparse.
+    seeds (iterable): Seeds of the permutation generators, one importance table per seed.
+    n_clusters (int): Number of KMeans clusters.
+    n_workers (int): Worker processes, None for one per CPU, 1 to run in this process.
+    warm_start (bool): Start each refit from the baseline centroids instead of a fresh k-means++ init.
+                       Faster, but it measures a different (local) silhouette drop than a cold refit.
+    n_repeats (int): Maximum number of permutations per column.
+    early_stopping (bool): Stop repeating a column once its drop is confidently positive or negative.
+    min_repeats (int): Permutations per column before early stopping is considered.
+    z (float): Normal quantile of the confidence interval used for early stopping.
+    silhouette_options (dict): Keyword arguments of silhouette.silhouette_score, e.g. {'mode': 'sample'}.
+    columns (list): Column names, required when data is not a DataFrame.
+    engine (str): 'full' or 'minibatch' k-means for the baseline and every refit, see clustering.ENGINES.
+    cache (result_cache.ResultCache): Persistent cache of the refit scores, keyed by the code version, a
+                                      fingerprint of the data, the columns, the permutation (seed, column,
+                                      repeat) and the model parameters. Only the refits missing from it are
+                                      computed.
+
+    Returns:
+    tuple: (baseline_score, dict of seed -> pd.DataFrame indexed by column with 'silhouette_drop',
+           'std' and 'n_repeats', sorted by 'silhouette_drop' descending).
+    """
+    seeds = list(seeds)
+    silhouette_options = silhouette_options or {}
+    if columns is None:
+        columns = list(data.columns)
+    values = as_float(data)
+    n_rows, n_cols = values.shape
+    # Everything a refit score depends on besides its (seed, column, repeat): the code computing it, the data and
+    # the parameters; n_repeats changes the permutations drawn for a seed
+    params_key = cache_key('permutation_importance', code_version(__name__), fingerprint(values), list(columns),
+                           n_clusters, warm_start, n_repeats, engine, sorted(silhouette_options.items()))
+
+    baseline, baseline_score = baseline_clustering(values, n_clusters, silhouette_options, engine=engine)
+    if sp.issparse(values):
+        values = values.tocsc()
+    init = baseline.cluster_centers_ if warm_start else None
+
+    permutations = {seed: _draw_permutations(n_rows, n_cols, seed, n_repeats) for seed in seeds}
+    drops = {(seed, col_idx): [] for seed in seeds for col_idx in range(n_cols)}
+    active = list(drops)
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    with worker_pool(n_workers, values=values, n_clusters=n_clusters, init=init,
+                     silhouette_options=silhouette_options, engine=engine) as executor:
+        # One round per repeat, so that columns that are already decided drop out of later rounds
+        for repeat in range(n_repeats):
+            keys = {(seed, col_idx): cache_key(params_key, seed, col_idx, repeat) for seed, col_idx in active}
+            round_scores = cache.get_many(keys.values()) if cache is not None else {}
+            jobs = [(seed, col_idx, permutations[seed][col_idx][repeat]) for seed, col_idx in active
+                    if keys[(seed, col_idx)] not in round_scores]
+            scores = executor.map(_score_permutation, jobs, chunksize=max(1, len(jobs) // (4 * n_workers)))
+            fresh = {}
+            for seed, col_idx, score, records in scores:
+                profiling.add_records(records)
+                round_scores[keys[(seed, col_idx)]] = fresh[keys[(seed, col_idx)]] = score
+                # Saved as they come, so a crash loses at most a few hundred refits
+                if cache is not None and len(fresh) >= 256:
+                    cache.put_many(fresh)
+                    fresh = {}
+            if cache is not None and fresh:
+                cache.put_many(fresh)
+            for key in active:
+                drops[key].append(baseline_score - round_scores[keys[key]])
+
+            if early_stopping and repeat + 1 >= min_repeats:
+                active = [key for key in active if not _is_confident(drops[key], z)]
+            if not active:
+                break
+
+    importances = {}
+    for seed in seeds:
+        importance_df = pd.DataFrame({
+            'silhouette_drop': [np.mean(drops[(seed, i)]) for i in range(n_cols)],
+            'std': [np.std(drops[(seed, i)], ddof=1) if len(drops[(seed, i)]) > 1 else np.nan
+                    for i in range(n_cols)],
+            'n_repeats': [len(drops[(seed, i)]) for i in range(n_cols)],
+        }, index=columns)
+        importances[seed] = importance_df.sort_values(by='silhouette_drop', ascending=False)
+
+    return baseline_score, importances
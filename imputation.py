@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+
+def condition_mask(data, condition):
+    """
+    Rows where every column of the condition equals its value, a missing value never matches.
+
+    Parameters:
+    data (pd.DataFrame): The frame to test.
+    condition (dict): Column name -> required value.
+
+    Returns:
+    np.ndarray: Boolean mask of the rows.
+    """
+    mask = np.ones(len(data), dtype=bool)
+    for col, value in condition.items():
+        mask &= (data[col] == value).to_numpy(dtype=bool, na_value=False)
+    return mask
+
+
+def apply_fill_rules(data, rules):
+    """
+    Fills missing values by rules, in place.
+
+    A rule is (name, condition, columns, value): in the rows where the condition holds, the missing values of
+    the target columns are set to value. Rules are applied in order. Each distinct condition is evaluated once,
+    the first time a rule uses it, so a rule must not fill a column that a later rule's condition tests.
+    All target columns of a rule are filled in one block assignment.
+
+    Parameters:
+    data (pd.DataFrame): The frame to fill, modified in place.
+    rules (list): (name, condition dict, list of target columns, fill value) tuples.
+
+    Returns:
+    pd.DataFrame: Audit of the fills, one row per rule and target column with the number of values filled.
+    """
+    masks = {}
+    audit = []
+    for name, condition, columns, value in rules:
+        key = tuple(condition.items())
+        if key not in masks:
+            masks[key] = condition_mask(data, condition)
+
+        fill = data[columns].isna().to_numpy() & masks[key][:, None]
+        if fill.any():
+            data[columns] = data[columns].mask(fill, value)
+        audit += [{'rule': name, 'column': col, 'filled': int(n)} for col, n in zip(columns, fill.sum(axis=0))]
+    return pd.DataFrame(audit, columns=['rule', 'column', 'filled'])
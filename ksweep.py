@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.metrics.pairwise import euclidean_distances
+
+from clustering import as_float, make_kmeans, worker_pool, worker_state
+from memo import memoized
+from silhouette import silhouette_score
+
+
+def _fit(values, k, engine='full'):
+    return make_kmeans(k, engine=engine).fit(values)
+
+
+def _fit_in_worker(k):
+    return _fit(worker_state['values'], k, worker_state['engine'])
+
+
+def _grow_centers(values, model):
+    # The k centroids of the previous fit plus the point farthest from all of them
+    distances = euclidean_distances(values, model.cluster_centers_).min(axis=1)
+    farthest = values[int(np.argmax(distances))]
+    farthest = farthest.toarray() if sp.issparse(farthest) else np.atleast_2d(farthest)
+    return np.vstack([model.cluster_centers_, farthest])
+
+
+def fit_kmeans(values, n_clusters, engine='full'):
+    """
+    k-means of the engine (clustering.ENGINES) fitted on values with random_state=0, once per dataset:
+    a k_sweep() of the same data has already fitted it, and any later call for the same data and k reuses it.
+    """
+    return memoized('kmeans', values, lambda: _fit(values, n_clusters, engine), n_clusters, engine)
+
+
+def k_sweep(data, k_values, n_workers=None, warm_start=False, silhouette_options=None, distances=None,
+            engine='full'):
+    """
+    Fits KMeans for every k and scores each fit, e.g. to choose k from an elbow of the inertia or the best
+    silhouette instead of reading it off a plot.
+
+    The fits are independent and spread over a process pool. Each is the same fit that fit_kmeans() returns,
+    and the fitted models are remembered, so a later fit_kmeans() of one of the swept k is free. With warm_start
+    each k starts from the centroids of k - 1 plus the point farthest from them (a single init), which is
+    cheaper per fit but sequential, and those models are not remembered since they differ from a cold fit.
+
+    Parameters:
+    data (array-like or scipy.sparse matrix): Feature matrix to cluster. Sparse data stays sparse.
+    k_values (iterable): Numbers of clusters to fit, increasing.
+    n_workers (int): Worker processes, None for one per CPU, 1 to fit in this process.
+    warm_start (bool): Grow each k from the previous fit instead of a fresh k-means++ init.
+    silhouette_options (dict): Keyword arguments of silhouette.silhouette_score, e.g. {'mode': 'sample'}.
+    distances (np.ndarray): Precomputed silhouette.distance_matrix(data), shared by the silhouette of every k.
+    engine (str): 'full' or 'minibatch' k-means, see clustering.ENGINES.
+
+    Returns:
+    tuple: (pd.DataFrame indexed by k with 'inertia', 'silhouette' (NaN for k < 2) and 'n_iter',
+           dict of k -> fitted KMeans).
+    """
+    k_values = list(k_values)
+    silhouette_options = silhouette_options or {}
+    values = as_float(data)
+
+    models = {}
+    if warm_start:
+        previous = None
+        for k in k_values:
+            if previous is None or previous.n_clusters != k - 1:
+                models[k] = _fit(values, k, engine)
+            else:
+                models[k] = make_kmeans(k, engine=engine, init=_grow_centers(values, previous)).fit(values)
+            previous = models[k]
+    else:
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        n_workers = min(n_workers, len(k_values))
+        with worker_pool(n_workers, values=values, engine=engine) as executor:
+            fitted = list(executor.map(_fit_in_worker, k_values))
+        for k, model in zip(k_values, fitted):
+            models[k] = memoized('kmeans', values, lambda: model, k, engine)
+
+    results = pd.DataFrame({
+        'inertia': [models[k].inertia_ for k in k_values],
+        'silhouette': [silhouette_score(values, models[k].labels_, centers=models[k].cluster_centers_,
+                                        distances=distances, **silhouette_options) if k > 1 else np.nan
+                       for k in k_values],
+        'n_iter': [models[k].n_iter_ for k in k_values],
+    }, index=pd.Index(k_values, name='k'))
+    return results, models
+
+
+def elbow(results):
+    """
+    The elbow of the inertia curve of a k_sweep(), as yellowbrick's KElbowVisualizer locates it,
+    or None if the curve has none.
+    """
+    from yellowbrick.utils import KneeLocator
+
+    k_values = list(results.index)
+    knee = KneeLocator(k_values, list(results['inertia']), curve_nature='convex', curve_direction='decreasing').knee
+    # A plain int (KneeLocator gives a numpy integer), e.g. for the JSON of the seed store
+    return None if knee is None else int(knee)
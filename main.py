@@ -1,19 +1,85 @@
-import subprocess
+import argparse
+import sys
 
-# List of scripts to run in order
-scripts = [
-    "fixing_missing_values.py",
-    "data_preparation_encoding.py",
-    "Kmeans.py",
-    "summary_interpret.py"
-]
+import plots
+import profiling
+from artifacts import EXTENSIONS, artifact_path
+from pipeline import run_pipeline
 
-# Run each script sequentially
-for script in scripts:
-    print(f"\n--- Running {script} ---")
-    try:
-        subprocess.run(["python", script], check=True)
-        print(f"✅ Finished {script}")
-    except subprocess.CalledProcessError:
-        print(f"❌ Error occurred in {script}, stopping pipeline.")
-        break
\ No newline at end of file
+
+def build_stages(fmt='parquet', dtype='float64', plot_mode='show', plot_dir='plots'):
+    # Stages in order, with the files they read and write and the parameters they run with; the stages that draw
+    # figures get the plot mode (and the directory of the files) as parameters, so they are part of their keys
+    plot_params = {"plot_mode": plot_mode}
+    if plot_mode == 'file':
+        plot_params["plot_dir"] = plot_dir
+    cleaned = artifact_path('cleaned_data', fmt)
+    processed = 'processed_data.npz'
+    processed_table = artifact_path('processed_data', fmt)
+    summary = artifact_path('best_cluster_summary', fmt)
+
+    return [
+        {
+            "name": "fixing_missing_values",
+            "module": "fixing_missing_values",
+            "inputs": ["data/mental-health.csv"],
+            "outputs": [cleaned],
+            "params": {"output_path": cleaned},
+        },
+        {
+            "name": "data_preparation_encoding",
+            "module": "data_preparation_encoding",
+            "inputs": [cleaned, "data/stopwords_english.txt"],
+            "outputs": [processed, processed_table],
+            "params": {"input_path": cleaned, "output_path": processed, "dense_output_path": processed_table,
+                       "dtype": dtype, **plot_params},
+            "data_from": "fixing_missing_values",
+        },
+        {
+            "name": "Kmeans",
+            "module": "Kmeans",
+            "inputs": [processed],
+            "outputs": [summary],
+            "params": {"input_path": processed, "output_path": summary,
+                       "n_runs": 4, "variance_threshold": 0.071, "n_clusters": 3, **plot_params},
+        },
+        {
+            "name": "summary_interpret",
+            "module": "summary_interpret",
+            "inputs": [summary],
+            "outputs": [],
+            "params": {"input_path": summary, **plot_params},
+        },
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the mental health clustering pipeline.")
+    parser.add_argument('--force', action='store_true', help="Re-run every stage, ignoring cached results.")
+    parser.add_argument('--format', choices=sorted(EXTENSIONS), default='parquet',
+                        help="File format of the artifacts written between stages.")
+    parser.add_argument('--plots', choices=plots.MODES, default='show',
+                        help="Show the figures (blocking), render them to files in the background, or skip them.")
+    parser.add_argument('--dtype', choices=['float64', 'float32'], default='float64',
+                        help="Float dtype of the feature matrix, float32 halves the memory of the clustering.")
+    parser.add_argument('--plot-dir', default='plots', help="Directory of the figures with --plots file.")
+    parser.add_argument('--profile', default=None, metavar='REPORT',
+                        help="Write the wall time, CPU time, peak RSS and rows/columns of every stage and hot "
+                             "section to REPORT (.json or .csv).")
+    parser.add_argument('--cprofile-dir', default=None,
+                        help="Dump a cProfile of every stage that runs to <dir>/<stage>.prof.")
+    args = parser.parse_args()
+
+    plots.configure(args.plots, args.plot_dir)
+    if args.profile is not None:
+        profiling.enable()
+    succeeded = run_pipeline(build_stages(args.format, args.dtype, args.plots, args.plot_dir), force=args.force,
+                             profile_dir=args.cprofile_dir)
+    # The figures rendered in the background are finished after the numeric stages
+    for path in plots.wait():
+        print(f"🖼️ Saved {path}")
+    if args.profile is not None:
+        profiling.write_report(args.profile)
+        print(f"⏱️ Profile written to {args.profile}")
+    if not succeeded:
+        sys.exit(1)
@@ -0,0 +1,46 @@
+import hashlib
+
+import numpy as np
+import scipy.sparse as sp
+
+# Results computed once per dataset in this process, keyed by (name, data fingerprint, parameters)
+_cache = {}
+
+
+def fingerprint(values):
+    """
+    Content hash of an array, DataFrame or sparse matrix: equal data gives an equal fingerprint,
+    whatever object holds it.
+    """
+    if sp.issparse(values):
+        values = sp.csr_matrix(values)
+        digest = hashlib.sha1(values.data.tobytes())
+        digest.update(values.indices.tobytes())
+        digest.update(values.indptr.tobytes())
+        digest.update(f"csr{values.shape}{values.dtype.str}".encode())
+        return digest.hexdigest()
+
+    values = np.ascontiguousarray(values)
+    digest = hashlib.sha1(values.tobytes())
+    digest.update(f"{values.shape}{values.dtype.str}".encode())
+    return digest.hexdigest()
+
+
+def memoized(name, values, compute, *params):
+    """
+    Returns compute() for this dataset and parameters, calling it only the first time they are seen.
+
+    Parameters:
+    name (str): What is computed, e.g. 'baseline'.
+    values (array-like): The dataset the result depends on.
+    compute (callable): Computes the result, called without arguments.
+    params: Any other (hashable) values the result depends on.
+    """
+    key = (name, fingerprint(values), params)
+    if key not in _cache:
+        _cache[key] = compute()
+    return _cache[key]
+
+
+def clear():
+    _cache.clear()
@@ -0,0 +1,261 @@
+import numpy as np
+import pandas as pd
+
+# ----- Answer normalization spec -----
+# Answers replaced in every text column, before the per-column mappings below
+COMMON_MAPPING = {"Maybe": "I don't know"}
+
+country_mapping = {'United Kingdom': 'Europe', 'Germany': 'Europe', 'Netherlands': 'Europe',
+                   'Czech Republic': 'Europe', 'Lithuania': 'Europe', 'France': 'Europe',
+                   'Poland': 'Europe', 'Belgium': 'Europe', 'Denmark': 'Europe', 'Sweden': 'Europe',
+                   'Russia': 'Europe', 'Spain': 'Europe', 'Norway': 'Europe', 'Ireland': 'Europe',
+                   'Italy': 'Europe', 'Finland': 'Europe', 'Slovakia': 'Europe', 'Austria': 'Europe',
+                   'Greece': 'Europe', 'Romania': 'Europe', 'Hungary': 'Europe', 'Estonia': 'Europe',
+                   'Bosnia and Herzegovina': 'Europe', 'Bulgaria': 'Europe', 'Serbia': 'Europe',
+                   'United States of America': 'North America', 'Canada': 'North America',
+                   'Mexico': 'North America', 'Costa Rica': 'North America', 'Guatemala': 'North America',
+                   'India': 'Asia', 'Vietnam': 'Asia', 'Pakistan': 'Asia', 'Afghanistan': 'Asia',
+                   'Iran': 'Asia', 'Israel': 'Asia', 'Taiwan': 'Asia', 'Japan': 'Asia', 'Bangladesh': 'Asia',
+                   'Brunei': 'Asia', 'China': 'Asia',
+                   'Brazil': 'South America', 'Venezuela': 'South America', 'Argentina': 'South America',
+                   'Colombia': 'South America', 'Chile': 'South America', 'Ecuador': 'South America',
+                   'Australia': 'Oceania', 'New Zealand': 'Oceania',
+                   'South Africa': 'Africa', 'Algeria': 'Africa', 'United Arab Emirates': 'Asia',
+                   'Switzerland': 'Europe', 'Turkey': 'Asia'}
+
+# Column -> {raw answer: normalized answer}, applied after COMMON_MAPPING. Answers not listed are kept.
+# "A" groups the "don't know / not applicable" style answers.
+ANSWER_MAPPINGS = {
+    'Do you feel that being identified as a person with a mental health issue would hurt your career?': {
+        "No, I don't think it would": "No",
+        'No, it has not': "No",
+        'Yes, I think it would': "Yes",
+        'Yes, it has': "Yes"
+    },
+    'Do you think that team members/co-workers would view you more negatively if they knew you suffered from a '
+    'mental health issue?': {
+        "No, I don't think they would": "No",
+        'Yes, I think they would': "Yes",
+        'Yes, they do': "Yes",
+        'No, they do not': "No"
+    },
+    'Have you observed or experienced an unsupportive or badly handled response to a mental health issue in your '
+    'current or previous workplace?': {
+        "Maybe/Not sure": "A",
+        "Yes, I experienced": "Yes",
+        "Yes, I observed": "Yes",
+        "No response": "A"
+    },
+    'If a mental health issue prompted you to request a medical leave from work, asking for that leave would be:': {
+        "Very easy": "Easy",
+        "Somewhat easy": "Easy",
+        "Somewhat difficult": "Difficult",
+        "Very difficult": "Difficult",
+        "Neither easy nor difficult": "A",
+        "I don't know": "A",
+        "Not applicable": "A"
+    },
+    'How willing would you be to share with friends and family that you have a mental illness?': {
+        'Very open': 'Open', 'Somewhat open': 'Open', 'Neutral': 'NA', 'Somewhat not open': 'Not open',
+        'Not open at all': 'Not open', 'Not applicable to me (I do not have a mental illness)': 'NA'
+    },
+    'Have your previous employers provided mental health benefits?': {
+        "No, none did": "No",
+        "Yes, they all did": "Yes",
+        "Some did": "Yes",
+        "I don't know": "NA",
+        "No previous employer": "NA"
+    },
+    'Did your previous employers ever formally discuss mental health (as part of a wellness campaign or other '
+    'official communication)?': {
+        "None did": "No",
+        "Some did": "Yes",
+        "I don't know": "NA",
+        "No previous employer": "NA",
+        "Yes, they all did": "Yes"
+    },
+    'Do you think that discussing a mental health disorder with your employer would have negative consequences?': {
+        "Some of them": "Yes",
+        "None of them": "No",
+        "I don't know": "A",
+        "Yes, all of them": "Yes",
+        "No previous employer": "A",
+        "Not applicable": "A"
+    },
+    'Do you think that discussing a mental health disorder with previous employers would have negative '
+    'consequences?': {
+        "Some of them": "Yes",
+        "None of them": "No",
+        "I don't know": "A",
+        "Yes, all of them": "Yes",
+        "No previous employer": "A"
+    },
+    'What country do you live in?': country_mapping,
+    'What country do you work in?': country_mapping,
+    'Was your anonymity protected if you chose to take advantage of mental health or substance abuse treatment '
+    'resources with previous employers?': {
+        "Yes, always": "Yes",
+        "Sometimes": "Yes",
+        "I don't know": "A",
+        "No": "No",
+        "No previous employer": "A"
+    },
+    'Did you feel that your previous employers took mental health as seriously as physical health?': {
+        "I don't know": "A",
+        "Some did": "Yes",
+        "None did": "No",
+        "Yes, they all did": "Yes",
+        "No previous employer": "A"
+    },
+    'If you have a mental health issue, do you feel that it interferes with your work when being treated '
+    'effectively?': {
+        "Not applicable to me": "A",
+        "Rarely": "Yes",
+        "Sometimes": "Yes",
+        "Never": "No",
+        "Often": "Yes"
+    },
+    'If you have a mental health issue, do you feel that it interferes with your work when NOT being treated '
+    'effectively?': {
+        "Not applicable to me": "A",
+        "Rarely": "Yes",
+        "Sometimes": "Yes",
+        "Never": "No",
+        "Often": "Yes"
+    },
+    'Do you feel that your employer takes mental health as seriously as physical health?': {
+        "No": "No",
+        "Yes": "Yes",
+        "Not applicable": "A",
+        "I don't know": "A"
+    },
+    'Is your anonymity protected if you choose to take advantage of mental health or substance abuse treatment '
+    'resources provided by your employer?': {
+        "No": "No",
+        "Yes": "Yes",
+        "Not applicable": "A",
+        "I don't know": "A"
+    },
+    'Does your employer offer resources to learn more about mental health concerns and options for seeking help?': {
+        "No": "No",
+        "Yes": "Yes",
+        "Not applicable": "A",
+        "I don't know": "A"
+    },
+    'Has your employer ever formally discussed mental health (for example, as part of a wellness campaign or other '
+    'official communication)?': {
+        "No": "No",
+        "Yes": "Yes",
+        "Not applicable": "A",
+        "I don't know": "A"
+    },
+    'Did your previous employers provide resources to learn more about mental health issues and how to seek help?': {
+        "Non did": "No",
+        "None did": "No",
+        "Some did": "Yes",
+        "No previous employer": "A",
+        "Yes, they all did": "Yes",
+        "Yes, all of them": "Yes"
+    },
+    'Have your observations of how another individual who discussed a mental health disorder made you less likely '
+    'to reveal a mental health issue yourself in your current workplace?': {
+        "No response": "A",
+        "Yes": "Yes",
+        "No": "No",
+        "I don't know": "A"
+    },
+    'Were you aware of the options for mental health care provided by your previous employers?': {
+        "Not Aware": "No",
+        "Aware": "Yes",
+        "No History": "A",
+    },
+    'Do you think that discussing a physical health issue with previous employers would have negative '
+    'consequences?': {
+        "None of them": "No",
+        "Some of them": "Yes",
+        "Yes, all of them": "Yes",
+        "No previous employer": "A"
+    },
+    'Would you feel comfortable discussing a mental health disorder with your coworkers?': {
+        "No": "No",
+        "Not applicable": "A",
+        "I don't know": "A",
+        "Yes": "Yes"
+    },
+    'Do you think that discussing a physical health issue with your employer would have negative consequences?': {
+        "No": "No",
+        "Not applicable": "A",
+        "I don't know": "A",
+        "Yes": "Yes"
+    },
+    'Did you hear of or observe negative consequences for co-workers with mental health issues in your previous '
+    'workplaces?': {
+        "None of them": "No",
+        "Some of them": "Yes",
+        "No previous workplace": "A",
+        "Yes, all of them": "Yes"
+    },
+    'Would you feel comfortable discussing a mental health disorder with your direct supervisor(s)?': {
+        "Yes": "Yes",
+        "I don't know": "A",
+        "Not applicable": "A",
+        "No": "No"
+    },
+}
+
+
+def compile_mappings(answer_mappings=ANSWER_MAPPINGS, common_mapping=COMMON_MAPPING):
+    """
+    Composes the common mapping with every column mapping, so that each column needs a single lookup.
+
+    Returns:
+    dict: Column name -> {raw answer: final answer}. Other text columns use common_mapping alone.
+    """
+    compiled = {}
+    for col, mapping in answer_mappings.items():
+        composed = {}
+        for raw in set(common_mapping) | set(mapping):
+            common = common_mapping.get(raw, raw)
+            composed[raw] = mapping.get(common, common)
+        compiled[col] = composed
+    return compiled
+
+
+COMPILED_MAPPINGS = compile_mappings()
+
+
+def _is_text(column):
+    return pd.api.types.is_object_dtype(column.dtype) or pd.api.types.is_string_dtype(column.dtype)
+
+
+def remap_column(column, mapping):
+    """
+    Replaces the answers of one column through a mapping, looking up each distinct answer once.
+    Same result as column.replace(mapping), missing values stay missing.
+    """
+    codes, uniques = pd.factorize(column)
+    if not any(value in mapping for value in uniques):
+        return column
+    # The extra last entry is picked by the -1 code of missing values
+    lookup = np.array([mapping.get(value, value) for value in uniques] + [np.nan], dtype=object)
+    return pd.Series(lookup[codes], index=column.index, name=column.name).astype(column.dtype)
+
+
+def normalize_answers(df, compiled=COMPILED_MAPPINGS, common_mapping=COMMON_MAPPING):
+    """
+    Normalizes the survey answers in place: the compiled mapping of every column in the spec and the
+    common mapping alone on the other text columns, one remap per column.
+
+    Parameters:
+    df (pd.DataFrame): Survey answers, modified in place.
+    compiled (dict): Output of compile_mappings().
+    common_mapping (dict): Mapping of the text columns that are not in the spec.
+
+    Returns:
+    pd.DataFrame: df.
+    """
+    for col in df.columns:
+        mapping = compiled.get(col, common_mapping if _is_text(df[col]) else None)
+        if mapping:
+            df[col] = remap_column(df[col], mapping)
+    return df
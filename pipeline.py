@@ -0,0 +1,160 @@
+import ast
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import traceback
+
+import profiling
+
+CACHE_FILE = '.pipeline_cache.json'
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _project_spec(name, root):
+    # Spec of a module of this project (a .py file under root), None for installed packages and the standard
+    # library; the top-level package is looked up first so that no installed package gets imported
+    try:
+        top = importlib.util.find_spec(name.split('.')[0])
+        if top is None or top.origin is None or not os.path.abspath(top.origin).startswith(root + os.sep):
+            return None
+        spec = top if '.' not in name else importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return None
+    if spec is None or spec.origin is None or not spec.origin.endswith('.py') or 'site-packages' in spec.origin:
+        return None
+    return spec
+
+
+def module_sources(module):
+    """
+    Source files of a module and of every module of this project it imports, directly or through other project
+    modules, e.g. Kmeans.py with clustering.py, silhouette.py, importance.py, ... Installed packages are left out.
+
+    Returns:
+    list: Absolute paths, sorted.
+    """
+    root = os.path.dirname(os.path.abspath(importlib.util.find_spec(module).origin))
+    sources = set()
+    pending = [module]
+    while pending:
+        spec = _project_spec(pending.pop(), root)
+        if spec is None or os.path.abspath(spec.origin) in sources:
+            continue
+        origin = os.path.abspath(spec.origin)
+        sources.add(origin)
+        with open(origin, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), origin)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                pending.append(node.module)
+                # `from package import module` imports a module too
+                package = _project_spec(node.module, root)
+                if package is not None and package.submodule_search_locations is not None:
+                    pending.extend(f"{node.module}.{alias.name}" for alias in node.names)
+    return sorted(sources)
+
+
+def stage_key(stage):
+    """
+    Content hash of everything a stage depends on: its source file and the project modules it imports
+    (see module_sources), its input files and its parameters.
+
+    Parameters:
+    stage (dict): Stage declaration with 'module', 'inputs' and 'params'.
+
+    Returns:
+    str: Hex digest that changes whenever the stage would produce different outputs.
+    """
+    digest = hashlib.sha256()
+    for source in module_sources(stage['module']):
+        digest.update(os.path.basename(source).encode())
+        digest.update(file_hash(source).encode())
+    for path in stage['inputs']:
+        digest.update(path.encode())
+        digest.update(file_hash(path).encode())
+    digest.update(json.dumps(stage['params'], sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def load_cache(cache_file=CACHE_FILE):
+    if not os.path.exists(cache_file):
+        return {}
+    with open(cache_file) as f:
+        return json.load(f)
+
+
+def save_cache(cache, cache_file=CACHE_FILE):
+    with open(cache_file, 'w') as f:
+        json.dump(cache, f, indent=2)
+
+
+def is_cached(stage, key, entry):
+    # A stage is up to date when its key matches and its outputs are still the ones it wrote
+    if entry is None or entry['key'] != key:
+        return False
+    for path in stage['outputs']:
+        if not os.path.exists(path) or entry['outputs'].get(path) != file_hash(path):
+            return False
+    return True
+
+
+def run_pipeline(stages, force=False, cache_file=CACHE_FILE, profile_dir=None):
+    """
+    Runs the stages in order inside the current interpreter, skipping stages whose inputs,
+    parameters and code are unchanged since their last successful run.
+
+    Parameters:
+    stages (list): Stage declarations (dicts with 'name', 'module', 'inputs', 'outputs', 'params' and
+                   optionally 'data_from', the upstream stage whose returned frame is passed in as `data`).
+    force (bool): Re-run every stage regardless of the cache.
+    cache_file (str): JSON file holding the hash of each stage's last run.
+    profile_dir (str): If given, every stage that runs is profiled with cProfile into <profile_dir>/<name>.prof.
+
+    Returns:
+    bool: True if every stage finished or was skipped, False if a stage failed.
+    """
+    cache = load_cache(cache_file)
+    results = {}
+
+    for stage in stages:
+        name = stage['name']
+        key = stage_key(stage)
+        if not force and is_cached(stage, key, cache.get(name)):
+            print(f"\n⏭️ Skipping {name} (inputs, parameters and code unchanged)")
+            continue
+
+        print(f"\n--- Running {name} ---")
+        try:
+            # Modules are imported on first use so skipped stages cost nothing
+            module = importlib.import_module(stage['module'])
+            kwargs = dict(stage['params'])
+            # Hand over the upstream frame in memory when it was produced in this run,
+            # otherwise the stage reads the cached artifact from disk
+            upstream = stage.get('data_from')
+            if upstream in results:
+                kwargs['data'] = results[upstream]
+            profile_path = os.path.join(profile_dir, f"{name}.prof") if profile_dir is not None else None
+            # Timed as a whole when profiling is enabled (see profiling.py), the hot sections inside it are nested
+            with profiling.cprofiled(profile_path), profiling.section(name, kwargs.get('data')) as timing:
+                results[name] = timing.output(module.run(**kwargs))
+        except Exception:
+            traceback.print_exc()
+            print(f"❌ Error occurred in {name}, stopping pipeline.")
+            return False
+
+        cache[name] = {'key': key, 'outputs': {path: file_hash(path) for path in stage['outputs']}}
+        save_cache(cache, cache_file)
+        print(f"✅ Finished {name}")
+
+    return True
@@ -0,0 +1,98 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy import lazy_import
+
+matplotlib = lazy_import('matplotlib')
+
+# How figures are rendered:
+# 'show' draws them and blocks on plt.show() (interactive runs),
+# 'file' draws them with the Agg backend in background worker processes and saves them as PNG files,
+# 'off' skips them (and any computation that only serves a plot)
+MODES = ('show', 'file', 'off')
+
+_settings = {'mode': 'show', 'directory': 'plots', 'n_workers': 1}
+_executor = None
+_pending = []
+
+
+def configure(mode='show', directory='plots', n_workers=1):
+    """
+    Sets how the stages render their figures, see MODES. In 'file' mode the figures are saved as
+    <directory>/<name>.png by n_workers background processes.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown plot mode {mode!r}, expected one of {MODES}")
+    if (mode, directory, n_workers) == (_settings['mode'], _settings['directory'], _settings['n_workers']):
+        # Already set, e.g. by main.py before the stage configures it, the queued figures keep rendering
+        return
+    wait()
+    _settings.update(mode=mode, directory=directory, n_workers=n_workers)
+    if mode == 'file':
+        # Nothing may open a window in a headless run
+        matplotlib.use('Agg')
+
+
+def enabled():
+    return _settings['mode'] != 'off'
+
+
+def _init_renderer():
+    matplotlib.use('Agg')
+
+
+def _render_to_file(path, draw, args):
+    import matplotlib.pyplot as plt
+
+    draw(*args)
+    plt.gcf().savefig(path, bbox_inches='tight')
+    plt.close('all')
+    return path
+
+
+def render(name, draw, *args):
+    """
+    Renders a figure drawn by draw(*args) with pyplot, according to the configured mode.
+
+    In 'file' mode this returns as soon as the job is queued, the figure is drawn and saved in a worker
+    process, so draw must be a module-level function and args must be picklable.
+
+    Parameters:
+    name (str): File name of the figure, without extension.
+    draw (callable): Draws the figure on a new pyplot figure.
+    """
+    global _executor
+    mode = _settings['mode']
+    if mode == 'off':
+        return
+    if mode == 'show':
+        import matplotlib.pyplot as plt
+
+        draw(*args)
+        plt.show()
+        return
+
+    os.makedirs(_settings['directory'], exist_ok=True)
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=_settings['n_workers'], initializer=_init_renderer)
+    path = os.path.join(_settings['directory'], f"{name}.png")
+    _pending.append(_executor.submit(_render_to_file, path, draw, args))
+
+
+def wait():
+    """
+    Waits for the figures queued in 'file' mode and returns the paths written. A figure that failed to render
+    is reported, it does not stop the others.
+    """
+    global _executor
+    paths = []
+    for future in _pending:
+        try:
+            paths.append(future.result())
+        except Exception as e:
+            print(f"⚠️ A figure could not be rendered: {e!r}")
+    _pending.clear()
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+    return paths
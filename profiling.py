@@ -0,0 +1,246 @@
+import cProfile
+import csv
+import json
+import multiprocessing
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Unix only: on Windows the peak RSS and the CPU time of the child processes are reported as None
+    resource = None
+
+# Timing records of the stages and the named hot sections of this run, filled while profiling is enabled
+_settings = {'enabled': False, 'start': None}
+_records = []
+_stack = []
+
+COLUMNS = ['name', 'parent', 'pid', 'start_s', 'wall_s', 'cpu_s', 'children_cpu_s', 'peak_rss_mb',
+           'rows_in', 'cols_in', 'rows_out', 'cols_out']
+
+
+def enable():
+    # Starts a new report, later sections are recorded until disable()
+    _settings.update(enabled=True, start=time.perf_counter())
+    _records.clear()
+
+
+def disable():
+    _settings['enabled'] = False
+
+
+def enabled():
+    return _settings['enabled']
+
+
+def shape(obj):
+    """
+    (rows, columns) of a DataFrame, array, sparse matrix or Series (one column), (None, None) for anything else.
+    A tuple such as (matrix, columns) returned by a stage is measured by its first element.
+    """
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    obj_shape = getattr(obj, 'shape', None)
+    if obj_shape is None:
+        return None, None
+    if len(obj_shape) == 1:
+        return obj_shape[0], 1
+    return obj_shape[0], obj_shape[1]
+
+
+def _peak_rss_mb():
+    # High-water mark of the resident memory since the last _reset_peak_rss() (Linux), or of the process
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _children_cpu_s():
+    # CPU time of the finished child processes so far, None where it is not available
+    if resource is None:
+        return None
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return children.ru_utime + children.ru_stime
+
+
+def _higher(peak, other):
+    # The larger of two peaks, either of which may be unknown (None)
+    if peak is None or other is None:
+        return other if peak is None else peak
+    return max(peak, other)
+
+
+def _reset_peak_rss():
+    # Linux resets VmHWM to the current RSS, so each section measures its own peak; elsewhere this is a no-op
+    # and peak_rss_mb is the peak of the process so far
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+class Section:
+    """
+    A running section: call output() with what it produced to record the rows and columns out.
+    """
+
+    def __init__(self, record):
+        self.record = record
+
+    def output(self, obj):
+        if self.record is not None:
+            self.record['rows_out'], self.record['cols_out'] = shape(obj)
+        return obj
+
+
+_DISABLED = Section(None)
+
+
+@contextmanager
+def section(name, data=None):
+    """
+    Records the wall time, CPU time (of this process and of its finished child processes), peak RSS and the
+    rows and columns in and out of the enclosed code, when profiling is enabled. Sections can be nested,
+    the peak of a nested section also counts for the sections around it. Without the resource module
+    (Windows), the peak RSS and the child CPU time are None.
+
+    Parameters:
+    name (str): Name of the section in the report, e.g. 'encode.tfidf'.
+    data: What the section consumes, to record its rows and columns in.
+
+    Yields:
+    Section: Call its output(result) to record the rows and columns out.
+    """
+    if not _settings['enabled']:
+        yield _DISABLED
+        return
+
+    rows_in, cols_in = shape(data)
+    record = {'name': name, 'parent': _stack[-1]['name'] if _stack else None, 'pid': os.getpid(),
+              'start_s': time.perf_counter() - _settings['start'], 'rows_in': rows_in, 'cols_in': cols_in,
+              'rows_out': None, 'cols_out': None}
+    if _stack:
+        _stack[-1]['_peak'] = _higher(_stack[-1]['_peak'], _peak_rss_mb())
+    _reset_peak_rss()
+    record['_peak'] = None
+    _stack.append(record)
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    children = _children_cpu_s()
+    try:
+        yield Section(record)
+    finally:
+        finished_children = _children_cpu_s()
+        record['wall_s'] = round(time.perf_counter() - wall, 6)
+        record['cpu_s'] = round(time.process_time() - cpu, 6)
+        record['children_cpu_s'] = None if children is None else round(finished_children - children, 6)
+        record['peak_rss_mb'] = _higher(record.pop('_peak'), _peak_rss_mb())
+        _stack.pop()
+        if _stack:
+            _stack[-1]['_peak'] = _higher(_stack[-1]['_peak'], record['peak_rss_mb'])
+        _records.append(record)
+
+
+def reset_worker():
+    """
+    Called by the initializer of a pool worker: a forked worker inherits the records and the open sections of
+    the main process, which must not be handed back as its own.
+    """
+    _records.clear()
+    _stack.clear()
+
+
+def worker_records():
+    """
+    In a worker process, hands over the records it made since the last call, to be returned with the job's
+    result and added to the report with add_records(). In the main process it returns nothing, its records are
+    already in the report.
+    """
+    if not _settings['enabled'] or multiprocessing.parent_process() is None:
+        return []
+    # Only this process's own records, even in a worker whose initializer did not reset_worker()
+    pid = os.getpid()
+    records = [record for record in _records if record['pid'] == pid]
+    _records.clear()
+    return records
+
+
+def add_records(records):
+    # Records made in a worker process, attached to the section that is running here
+    for record in records:
+        if record['parent'] is None and _stack:
+            record = dict(record, parent=_stack[-1]['name'])
+        _records.append(record)
+
+
+def records():
+    return list(_records)
+
+
+def summary():
+    """
+    The records aggregated per section name: count, total and mean wall time, total CPU time, largest peak RSS.
+
+    Returns:
+    list: One dict per section name, by total wall time descending.
+    """
+    by_name = {}
+    for record in _records:
+        by_name.setdefault(record['name'], []).append(record)
+    rows = []
+    for name, group in by_name.items():
+        wall = sum(record['wall_s'] for record in group)
+        rows.append({'name': name, 'count': len(group), 'wall_s': wall, 'mean_wall_s': wall / len(group),
+                     'cpu_s': sum(record['cpu_s'] for record in group),
+                     'peak_rss_mb': max((record['peak_rss_mb'] for record in group
+                                         if record['peak_rss_mb'] is not None), default=None)})
+    return sorted(rows, key=lambda row: row['wall_s'], reverse=True)
+
+
+def write_report(path):
+    """
+    Writes the records of this run to path: JSON ({'sections': records, 'summary': per-name totals}) or CSV
+    (one line per record), by extension.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if os.path.splitext(path)[1].lower() == '.csv':
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(_records)
+    else:
+        with open(path, 'w') as f:
+            json.dump({'sections': _records, 'summary': summary()}, f, indent=2)
+
+
+@contextmanager
+def cprofiled(path):
+    """
+    Runs the enclosed code under cProfile and dumps the statistics to path (for pstats or snakeviz),
+    or just runs it when path is None.
+    """
+    if path is None:
+        yield
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
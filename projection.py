@@ -0,0 +1,83 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.decomposition import PCA, IncrementalPCA
+
+import profiling
+from memo import memoized
+
+# 'full' is the exact PCA, 'randomized' a randomized SVD of the top components only, 'incremental' an
+# IncrementalPCA fitted on chunks of rows, which never densifies the whole selection; 'auto' picks one by shape
+METHODS = ('auto', 'full', 'randomized', 'incremental')
+
+
+def choose_method(n_rows, n_cols, n_components=3, max_dense_cells=50_000_000):
+    """
+    Projection method for a n_rows x n_cols selection: 'incremental' when the dense selection would not fit in
+    max_dense_cells values, 'randomized' when both sides are large and few components are kept (the full SVD
+    then does far more work than needed), 'full' otherwise.
+    """
+    if n_rows * n_cols > max_dense_cells:
+        return 'incremental'
+    if min(n_rows, n_cols) > 500 and n_components < 0.8 * min(n_rows, n_cols):
+        return 'randomized'
+    return 'full'
+
+
+def _dense(block):
+    return block.toarray() if sp.issparse(block) else block
+
+
+def _dense_chunks(selection, chunk_rows):
+    # Dense row blocks of a sparse selection, the last block merged into the previous one if it is too small
+    # for an IncrementalPCA step
+    starts = list(range(0, selection.shape[0], chunk_rows))
+    if len(starts) > 1 and selection.shape[0] - starts[-1] < chunk_rows // 2:
+        starts.pop()
+    ends = starts[1:] + [selection.shape[0]]
+    for start, end in zip(starts, ends):
+        yield _dense(selection[start:end])
+
+
+def _project(data, columns, features, n_components, method, chunk_rows):
+    position = {col: i for i, col in enumerate(columns)}
+    selection = data[:, [position[col] for col in features]]
+    with profiling.section(f"projection.{method}", selection) as timing:
+        return timing.output(_decompose(selection, n_components, method, chunk_rows))
+
+
+def _decompose(selection, n_components, method, chunk_rows):
+    if method == 'incremental':
+        pca = IncrementalPCA(n_components=n_components)
+        for chunk in _dense_chunks(selection, chunk_rows):
+            pca.partial_fit(chunk)
+        return np.vstack([pca.transform(chunk) for chunk in _dense_chunks(selection, chunk_rows)])
+    if method == 'randomized':
+        return PCA(n_components=n_components, svd_solver='randomized', random_state=0).fit_transform(
+            _dense(selection))
+    if method == 'full':
+        return PCA(n_components=n_components, svd_solver='full').fit_transform(_dense(selection))
+    raise ValueError(f"Unknown projection method {method!r}, expected one of {METHODS}")
+
+
+def project(data, columns, features, n_components=3, method='auto', chunk_rows=10_000):
+    """
+    Principal components of the selected features, computed once per dataset and feature set: seeds that
+    select the same features share one decomposition.
+
+    Parameters:
+    data (np.ndarray or scipy.sparse matrix): Feature matrix, only the selected columns of a sparse one are
+                                              densified (by chunks of rows for the 'incremental' method).
+    columns (list): Column names of data.
+    features (list): Selected features.
+    n_components (int): Number of components kept.
+    method (str): 'auto', 'full', 'randomized' or 'incremental', see METHODS and choose_method.
+    chunk_rows (int): Rows per IncrementalPCA step.
+
+    Returns:
+    np.ndarray: (n_rows, n_components) projection.
+    """
+    if method == 'auto':
+        method = choose_method(data.shape[0], len(features), n_components)
+    return memoized('projection', data,
+                    lambda: _project(data, columns, features, n_components, method, chunk_rows),
+                    tuple(features), n_components, method, chunk_rows)
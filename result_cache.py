@@ -0,0 +1,114 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+
+import numpy as np
+import sklearn
+
+from pipeline import file_hash, module_sources
+
+CACHE_FILE = '.result_cache.sqlite'
+# Bumped when the meaning of the stored results changes in a way the code hash below does not capture
+SCHEMA_VERSION = 1
+
+
+@functools.lru_cache(maxsize=None)
+def code_version(module):
+    """
+    Version of the code behind the results of a module, to be part of their keys: the cache schema, the sklearn
+    and numpy versions, and a hash of the module and of every project module it imports (pipeline.module_sources).
+    Results computed by other code, e.g. before an edit of silhouette.py or an sklearn upgrade, are never reused.
+    """
+    digest = hashlib.sha1(f"{SCHEMA_VERSION}-{sklearn.__version__}-{np.__version__}".encode())
+    for source in module_sources(module):
+        digest.update(os.path.basename(source).encode())
+        digest.update(file_hash(source).encode())
+    return digest.hexdigest()
+
+
+def cache_key(*parts):
+    """
+    Fingerprint of the values a result depends on, e.g. cache_key(fingerprint(data), columns, seed, k, params).
+    The parts must be JSON serializable (tuples are hashed as lists).
+    """
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Persistent result cache in a SQLite file, bounded in size with least-recently-used eviction: results survive
+    the process, so a re-run of the same experiment or a run after a crash reuses them.
+
+    Parameters:
+    path (str): The SQLite file, created if missing.
+    max_bytes (int): Total size of the stored results; the least recently used ones are evicted beyond it.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_bytes=64 * 2 ** 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results '
+                                '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_used REAL)')
+        self.connection.commit()
+
+    def get_many(self, keys):
+        # key -> result for the keys in the cache, marking them as used
+        found = {}
+        keys = list(keys)
+        # SQLite limits the number of parameters of one statement
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT key, value FROM results WHERE key IN ({','.join('?' * len(batch))})", batch).fetchall()
+            found.update((key, pickle.loads(value)) for key, value in rows)
+        now = time.time()
+        self.connection.executemany('UPDATE results SET last_used = ? WHERE key = ?', [(now, key) for key in found])
+        self.connection.commit()
+        return found
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def put_many(self, results):
+        # Stores key -> result pairs, then evicts the least recently used results beyond max_bytes
+        now = time.time()
+        rows = []
+        for key, result in results.items():
+            value = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+            rows.append((key, value, len(value), now))
+        self.connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', rows)
+        self._evict()
+        self.connection.commit()
+
+    def put(self, key, result):
+        self.put_many({key: result})
+
+    def _evict(self):
+        total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self.connection.execute('SELECT key, size FROM results ORDER BY last_used, key'):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.connection.executemany('DELETE FROM results WHERE key = ?', evicted)
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def clear(self):
+        self.connection.execute('DELETE FROM results')
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
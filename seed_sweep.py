@@ -0,0 +1,170 @@
+import json
+import os
+
+import pandas as pd
+
+from clustering import make_kmeans, worker_pool, worker_state
+from importance import permutation_importance
+import profiling
+from memo import fingerprint
+from projection import project
+from result_cache import cache_key, code_version
+from silhouette import silhouette_score
+
+
+def selected_features(importance_df):
+    # The features whose permutation lowers the silhouette, in order of importance
+    return list(importance_df[importance_df['silhouette_drop'] > 0].index)
+
+
+def pca_clustering(data, columns, features, n_clusters, silhouette_options, engine='full', projection='auto'):
+    """
+    Clusters the 3 principal components of the selected features of one seed.
+
+    Parameters:
+    data (np.ndarray or scipy.sparse matrix): Feature matrix, only the selected columns of a sparse one are
+                                              densified.
+    columns (list): Column names of data.
+    features (list): Selected features.
+    projection (str): Method of projection.project, e.g. 'auto' or 'incremental'.
+
+    Returns:
+    tuple: ((n, 3) principal components, labels, silhouette score).
+    """
+    data_pca_3d = project(data, columns, features, n_components=3, method=projection)
+    model = make_kmeans(n_clusters, engine=engine).fit(data_pca_3d)
+    score = silhouette_score(data_pca_3d, model.labels_, centers=model.cluster_centers_, **silhouette_options)
+    return data_pca_3d, model.labels_, score
+
+
+def _cluster_features(features):
+    state = worker_state
+    clustering = pca_clustering(state['data'], state['columns'], list(features), state['n_clusters'],
+                                state['silhouette_options'], state['engine'], state['projection'])
+    return clustering, profiling.worker_records()
+
+
+class SeedStore:
+    """
+    One JSON file per finished seed (its importance table and score), so an interrupted sweep resumes with the
+    missing seeds only. The files live in a subdirectory named after a fingerprint of the data, of the
+    parameters and of the code version (result_cache.code_version), results of other data, parameters or code
+    are never reused. Files are written to a temporary name
+    and renamed, so a crash never leaves a partial result behind.
+
+    Parameters:
+    directory (str): Root directory of the stored sweeps.
+    data (array-like): The clustered data.
+    params (dict): Everything else the per-seed results depend on, JSON serializable.
+    """
+
+    def __init__(self, directory, data, params):
+        key = cache_key(code_version(__name__), params)
+        self.directory = os.path.join(directory, f"{fingerprint(data)[:16]}-{key[:16]}")
+
+    def _path(self, seed):
+        return os.path.join(self.directory, f"seed_{seed}.json")
+
+    def load(self, seed):
+        # (importance_df, score) of a finished seed, None if it has not finished
+        if not os.path.exists(self._path(seed)):
+            return None
+        with open(self._path(seed)) as f:
+            result = json.load(f)
+        importance_df = pd.DataFrame(result['importance'], columns=['silhouette_drop', 'std', 'n_repeats'],
+                                     index=result['columns']).astype({'n_repeats': int})
+        return importance_df, result['score']
+
+    def save(self, seed, importance_df, score):
+        os.makedirs(self.directory, exist_ok=True)
+        result = {'seed': seed, 'score': score, 'columns': list(importance_df.index),
+                  'importance': importance_df.to_numpy().tolist()}
+        tmp_path = self._path(seed) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(result, f)
+        os.replace(tmp_path, self._path(seed))
+
+
+def seed_sweep(data, columns, seeds, n_clusters=3, n_workers=None, batch_size=8, store=None,
+               silhouette_options=None, engine='full', projection='auto', **importance_options):
+    """
+    Permutation importance, feature selection and PCA clustering for every seed, as independent tasks.
+
+    The seeds are processed in batches of batch_size: the permutation refits of a batch share one worker pool
+    (permutation_importance), then the PCA clusterings of its seeds run in parallel, once per distinct set of
+    selected features over the whole sweep since seeds that select the same features get the same clustering.
+    Every finished seed is saved to the store before the next batch starts, and seeds already in the store are
+    not recomputed. A seed's result does not depend on the batch it ran in, so a resumed sweep gives the same
+    results. Only the clustering of the best set so far is kept, and returned with the best seed.
+
+    Parameters:
+    data (np.ndarray or scipy.sparse matrix): Feature matrix, e.g. after the variance filter.
+    columns (list): Column names of data.
+    seeds (iterable): Seeds of the permutation importance.
+    n_workers (int): Worker processes, None for one per CPU, 1 to run in this process.
+    batch_size (int): Seeds per batch, i.e. how much work a crash can lose.
+    store (SeedStore): Where finished seeds are saved and resumed from, None to keep nothing.
+    projection (str): Method of projection.project for the PCA step.
+    importance_options: Other keyword arguments of importance.permutation_importance.
+
+    Returns:
+    tuple: (dict seed -> (importance pd.DataFrame, silhouette score after PCA) in seed order,
+            (best seed, its (n, 3) principal components, its labels)), the best seed as chosen by best_seed().
+    """
+    seeds = sorted(seeds)
+    silhouette_options = silhouette_options or {}
+    results = {}
+    for seed in seeds:
+        stored = store.load(seed) if store is not None else None
+        if stored is not None:
+            results[seed] = stored
+    missing = [seed for seed in seeds if seed not in results]
+    if store is not None and results:
+        print(f"Resuming the seed sweep: {len(results)} of {len(seeds)} seeds already done")
+
+    # Score of every distinct set of selected features, over all batches and the stored seeds
+    scores = {tuple(selected_features(importance_df)): score for importance_df, score in results.values()}
+    # ((-score, lowest seed), features, (principal components, labels)) of the best set clustered so far
+    best = None
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        _, importances = permutation_importance(data, batch, n_clusters=n_clusters, n_workers=n_workers,
+                                                silhouette_options=silhouette_options, columns=columns,
+                                                engine=engine, **importance_options)
+        features = {seed: tuple(selected_features(importances[seed])) for seed in batch}
+        # The sets no earlier batch or stored seed selected, their lowest seed is in this batch
+        first_seed = {}
+        for seed in batch:
+            if features[seed] not in scores:
+                first_seed.setdefault(features[seed], seed)
+        jobs = sorted(first_seed)
+        with worker_pool(min(n_workers, len(jobs)), data=data, columns=columns, n_clusters=n_clusters,
+                         silhouette_options=silhouette_options, engine=engine, projection=projection) as executor:
+            for job, ((data_pca_3d, labels, score), records) in zip(jobs, executor.map(_cluster_features, jobs)):
+                profiling.add_records(records)
+                scores[job] = score
+                rank = (-score, first_seed[job])
+                if best is None or rank < best[0]:
+                    best = (rank, job, (data_pca_3d, labels))
+        for seed in batch:
+            results[seed] = (importances[seed], scores[features[seed]])
+            if store is not None:
+                store.save(seed, importances[seed], scores[features[seed]])
+
+    chosen = best_seed(results)
+    winner = tuple(selected_features(results[chosen][0]))
+    if best is not None and best[1] == winner:
+        data_pca_3d, labels = best[2]
+    else:
+        # The best features come from stored seeds only, they were not clustered by this run
+        data_pca_3d, labels, _ = pca_clustering(data, columns, list(winner), n_clusters, silhouette_options,
+                                                engine, projection)
+    return {seed: results[seed] for seed in seeds}, (chosen, data_pca_3d, labels)
+
+
+def best_seed(results):
+    # Highest silhouette, the lowest seed among equal scores: the same whatever order the seeds finished in
+    return min(results, key=lambda seed: (-results[seed][1], seed))
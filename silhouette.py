@@ -0,0 +1,172 @@
+import numpy as np
+from sklearn.metrics.pairwise import euclidean_distances
+
+from clustering import as_float
+import profiling
+
+MODES = ('exact', 'sample', 'simplified')
+
+
+def _centers(X, codes, n_clusters):
+    return np.vstack([np.asarray(X[codes == c].mean(axis=0)).ravel() for c in range(n_clusters)])
+
+
+def _cluster_index(labels):
+    clusters, codes = np.unique(labels, return_inverse=True)
+    counts = np.bincount(codes, minlength=len(clusters))
+    return codes, counts
+
+
+def distance_matrix(X):
+    """
+    Full n x n euclidean distance matrix of X, for data whose exact silhouette is computed several times
+    (a k-sweep, a silhouette plot) and that fits in memory. It is not memoized: the caller holds it for as
+    long as it needs it and it is freed with the last reference.
+    """
+    return euclidean_distances(as_float(X))
+
+
+def _silhouette_rows(X, codes, counts, rows, chunk_size, distances=None):
+    # Exact silhouette of the given rows against all points, chunk_size rows of distances at a time
+    n_clusters = len(counts)
+    # (n, k) indicator matrix: distances @ indicator gives the summed distance to each cluster
+    indicator = np.zeros((X.shape[0], n_clusters))
+    indicator[np.arange(X.shape[0]), codes] = 1.0
+
+    values = np.empty(len(rows))
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        block = euclidean_distances(X[chunk], X) if distances is None else distances[chunk]
+        sums = block @ indicator
+        own = codes[chunk]
+        own_counts = counts[own]
+
+        a = sums[np.arange(len(chunk)), own] / np.maximum(own_counts - 1, 1)
+        means = sums / counts
+        means[np.arange(len(chunk)), own] = np.inf
+        b = means.min(axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            s = (b - a) / np.maximum(a, b)
+        # Points alone in their cluster score 0, as in sklearn
+        s[own_counts == 1] = 0.0
+        values[start:start + len(chunk)] = np.nan_to_num(s)
+    return values
+
+
+def stratified_sample(labels, sample_size, random_state=0):
+    """
+    Row indices of a sample drawn from every cluster in proportion to its size (at least two rows per cluster).
+    """
+    codes, counts = _cluster_index(labels)
+    n = len(codes)
+    if sample_size >= n:
+        return np.arange(n)
+
+    rng = np.random.default_rng(random_state)
+    rows = []
+    for cluster, count in enumerate(counts):
+        members = np.flatnonzero(codes == cluster)
+        take = min(count, max(2, int(round(sample_size * count / n))))
+        rows.append(rng.choice(members, size=take, replace=False))
+    return np.sort(np.concatenate(rows))
+
+
+def estimate_silhouette(X, labels, sample_size=2000, chunk_size=1000, random_state=0, z=1.96, distances=None):
+    """
+    Estimates the mean silhouette from a cluster-stratified sample of points.
+
+    Each sampled point gets its exact silhouette against the full data, so the cost is
+    sample_size x n distances instead of n x n.
+
+    Returns:
+    tuple: (estimate, lower, upper) where (lower, upper) is the z confidence interval.
+    """
+    X = as_float(X)
+    codes, counts = _cluster_index(labels)
+    rows = stratified_sample(labels, sample_size, random_state=random_state)
+    values = _silhouette_rows(X, codes, counts, rows, chunk_size, distances)
+    if len(rows) == len(codes):
+        estimate = float(np.mean(values))
+        return estimate, estimate, estimate
+
+    # Stratified mean and variance, each cluster weighted by its share of the data
+    weights = counts / counts.sum()
+    sample_codes = codes[rows]
+    estimate = 0.0
+    variance = 0.0
+    for cluster, weight in enumerate(weights):
+        cluster_values = values[sample_codes == cluster]
+        m = len(cluster_values)
+        estimate += weight * cluster_values.mean()
+        if m > 1:
+            variance += weight ** 2 * cluster_values.var(ddof=1) / m * (1 - m / counts[cluster])
+    half_width = z * np.sqrt(variance)
+    return float(estimate), float(estimate - half_width), float(estimate + half_width)
+
+
+def _simplified_values(X, codes, counts, centers):
+    distances = euclidean_distances(X, centers)
+    rows = np.arange(X.shape[0])
+    a = distances[rows, codes]
+    distances[rows, codes] = np.inf
+    b = distances.min(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s = np.nan_to_num((b - a) / np.maximum(a, b))
+    s[counts[codes] == 1] = 0.0
+    return s
+
+
+def silhouette_values(X, labels, mode='exact', sample_size=2000, chunk_size=1000, random_state=0, centers=None,
+                      distances=None):
+    """
+    Per-point silhouette values through the selected backend, e.g. for a silhouette plot.
+
+    'exact' scores every point in chunks of rows, so memory stays at chunk_size x n distances instead of n x n.
+    'simplified' uses the distance to the own centroid and to the nearest other centroid, n x k distances.
+
+    Returns:
+    tuple: (rows, values), the row indices that were scored ('sample' mode scores a stratified sample only)
+           and their silhouette values.
+    """
+    X = as_float(X)
+    codes, counts = _cluster_index(labels)
+    rows = np.arange(X.shape[0])
+    if mode == 'exact':
+        return rows, _silhouette_rows(X, codes, counts, rows, chunk_size, distances)
+    if mode == 'sample':
+        rows = stratified_sample(labels, sample_size, random_state=random_state)
+        return rows, _silhouette_rows(X, codes, counts, rows, chunk_size, distances)
+    if mode == 'simplified':
+        if centers is None:
+            centers = _centers(X, codes, len(counts))
+        return rows, _simplified_values(X, codes, counts, centers)
+    raise ValueError(f"Unknown silhouette mode {mode!r}, expected one of {MODES}")
+
+
+def silhouette_score(X, labels, mode='exact', sample_size=2000, chunk_size=1000, random_state=0, centers=None,
+                     distances=None):
+    """
+    Mean silhouette of a clustering through the selected backend.
+
+    Parameters:
+    X (array-like): Clustered data.
+    labels (array-like): Cluster label of every row.
+    mode (str): 'exact' (chunked, bounded memory), 'sample' (stratified-sample estimate) or
+                'simplified' (centroid-based).
+    sample_size (int): Number of sampled points for the 'sample' mode.
+    chunk_size (int): Rows of distances held in memory at a time.
+    random_state (int): Seed of the sample for the 'sample' mode.
+    centers (array-like): Cluster centers for the 'simplified' mode, computed from the labels if omitted.
+    distances (np.ndarray): Precomputed distance_matrix(X), used instead of computing distances.
+
+    Returns:
+    float: The (estimated) mean silhouette.
+    """
+    with profiling.section(f"silhouette.{mode}", X):
+        if mode == 'sample':
+            return estimate_silhouette(X, labels, sample_size=sample_size, chunk_size=chunk_size,
+                                       random_state=random_state, distances=distances)[0]
+        _, values = silhouette_values(X, labels, mode=mode, chunk_size=chunk_size, centers=centers,
+                                      distances=distances)
+        return float(np.mean(values))
@@ -1,8 +1,11 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 
-# Read summary
-summary = pd.read_csv("best_cluster_summary.csv", index_col=0)
+import plots
+from artifacts import load_frame
+from lazy import lazy_import
+
+# Only needed for the plot, imported when it is drawn
+plt = lazy_import('matplotlib.pyplot')
 
 # Define your feature groups
 aggregated_groups = {
@@ -48,26 +51,45 @@ aggregated_groups = {
 
 }
 
-# Build dictionary of averaged values
-aggregated_data = {}
-
-for group, features in aggregated_groups.items():
-    existing = [f for f in features if f in summary.index]
-    if existing:
-        aggregated_data[group] = summary.loc[existing].mean()
-# Add Age as its own group
-if "What is your age?" in summary.index:
-    aggregated_data["Average Age"] = summary.loc["What is your age?"]
-
-# Convert to DataFrame
-aggregated_df = pd.DataFrame(aggregated_data).T  # Groups as rows
-
-# Plot
-aggregated_df.T.plot(kind='bar', figsize=(10, 6), colormap='tab20')
-plt.title("Aggregated Cluster Summary by Thematic Group")
-plt.ylabel("Average Percentage")
-plt.xlabel("Cluster")
-plt.xticks(rotation=0)
-plt.legend(title="Feature Group", bbox_to_anchor=(1.05, 1), loc='upper left')
-plt.tight_layout()
-plt.show()
+
+def plot_summary(aggregated_df):
+    aggregated_df.T.plot(kind='bar', figsize=(10, 6), colormap='tab20')
+    plt.title("Aggregated Cluster Summary by Thematic Group")
+    plt.ylabel("Average Percentage")
+    plt.xlabel("Cluster")
+    plt.xticks(rotation=0)
+    plt.legend(title="Feature Group", bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.tight_layout()
+
+
+def run(input_path='best_cluster_summary.parquet', plot_mode=None, plot_dir='plots'):
+    # Figures in the mode the pipeline passed in, which is part of the stage's parameters: a run with another
+    # mode re-runs the stage instead of skipping it without figures
+    if plot_mode is not None:
+        plots.configure(plot_mode, plot_dir)
+
+    # Read summary
+    summary = load_frame(input_path, index=True)
+
+    # Build dictionary of averaged values
+    aggregated_data = {}
+
+    for group, features in aggregated_groups.items():
+        existing = [f for f in features if f in summary.index]
+        if existing:
+            aggregated_data[group] = summary.loc[existing].mean()
+    # Add Age as its own group
+    if "What is your age?" in summary.index:
+        aggregated_data["Average Age"] = summary.loc["What is your age?"]
+
+    # Convert to DataFrame
+    aggregated_df = pd.DataFrame(aggregated_data).T  # Groups as rows
+
+    # Plot
+    plots.render('cluster_summary', plot_summary, aggregated_df)
+
+    return aggregated_df
+
+
+if __name__ == '__main__':
+    run()
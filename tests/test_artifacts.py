@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+
+from artifacts import compact_dtypes, load_frame, save_frame, save_sparse_table
+
+
+@pytest.mark.parametrize('extension', ['.csv', '.parquet', '.arrow'])
+def test_sparse_table_matches_the_dense_one(tmp_path, extension):
+    # Indicator, whole-number, fractional and NaN columns, written in chunks smaller than the table
+    rng = np.random.default_rng(0)
+    dense = np.column_stack([rng.integers(0, 2, 50), rng.integers(0, 300, 50) * (rng.random(50) < 0.3),
+                             rng.random(50) * (rng.random(50) < 0.5), np.where(rng.random(50) < 0.1, np.nan, 0)])
+    columns = ['indicator', 'count', 'share', 'missing']
+    path = str(tmp_path / f"table{extension}")
+    save_sparse_table(sp.csr_matrix(dense), columns, path, chunk_rows=7)
+
+    expected = compact_dtypes(pd.DataFrame(dense, columns=columns))
+    if extension == '.csv':
+        # CSV keeps no dtypes, the file must be the one the dense table gives
+        expected_path = str(tmp_path / 'expected.csv')
+        save_frame(expected, expected_path)
+        with open(path) as written, open(expected_path) as reference:
+            assert written.read() == reference.read()
+    else:
+        pd.testing.assert_frame_equal(load_frame(path), expected)
@@ -0,0 +1,46 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import Kmeans
+import memo
+import plots
+from artifacts import save_sparse
+from data_preparation_encoding import encode
+from fixing_missing_values import clean
+from ksweep import elbow, k_sweep
+
+
+@pytest.fixture(scope='module')
+def processed(tmp_path_factory):
+    # processed_data.npz of the survey, as the encoding stage writes it
+    plots.configure('off')
+    raw = pd.read_csv('data/mental-health.csv')
+    raw.columns = raw.columns.str.strip()
+    matrix, columns = encode(clean(raw))
+    path = str(tmp_path_factory.mktemp('processed') / 'processed_data.npz')
+    save_sparse(matrix, columns, path)
+    return path, matrix
+
+
+def test_elbow_is_a_plain_int(processed):
+    sweep, _ = k_sweep(processed[1], range(1, 8), n_workers=1, silhouette_options={'mode': 'simplified'})
+    knee = elbow(sweep)
+    assert type(knee) is int
+    assert knee in sweep.index
+
+
+@pytest.mark.parametrize('n_clusters', ['elbow', 'silhouette'])
+def test_stage_chooses_k(processed, tmp_path, n_clusters):
+    # The default path, with the seed store, must accept the chosen k
+    memo.clear()
+    seed_dir = str(tmp_path / 'seeds')
+    summary = Kmeans.run(input_path=processed[0], output_path=str(tmp_path / 'summary.csv'), n_runs=1,
+                         n_clusters=n_clusters, n_workers=1, silhouette_mode='simplified', seed_dir=seed_dir,
+                         result_cache=None)
+    (store,) = os.listdir(seed_dir)
+    with open(os.path.join(seed_dir, store, 'seed_0.json')) as f:
+        assert json.load(f)['seed'] == 0
+    assert 2 <= summary.shape[1] <= 7
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+
+import plots
+
+from clustering import densify_if_dense, make_kmeans
+from data_preparation_encoding import encode
+from fixing_missing_values import clean
+from Kmeans import variance_filter
+from silhouette import silhouette_score
+
+
+@pytest.fixture(scope='module')
+def features():
+    # The survey features the seed sweep clusters: encoded, then variance filtered (sparse)
+    plots.configure('off')
+    raw = pd.read_csv('data/mental-health.csv')
+    raw.columns = raw.columns.str.strip()
+    matrix, columns = encode(clean(raw))
+    data, _ = variance_filter(matrix, columns, 0.071)
+    return data
+
+
+def test_survey_features_are_densified(features):
+    assert sp.issparse(features)
+    assert features.nnz / np.prod(features.shape) > 0.1
+    assert isinstance(densify_if_dense(features), np.ndarray)
+
+
+def test_truly_sparse_matrix_stays_sparse():
+    matrix = sp.random(1000, 200, density=0.01, format='csr', random_state=0)
+    assert sp.issparse(densify_if_dense(matrix))
+
+
+def test_oversized_matrix_stays_sparse(features):
+    assert sp.issparse(densify_if_dense(features, max_dense_bytes=features.shape[0] * features.shape[1]))
+
+
+def test_dense_layout_gives_the_same_scores(features):
+    dense = densify_if_dense(features)
+    labels = make_kmeans(3).fit(features).labels_
+    np.testing.assert_array_equal(make_kmeans(3).fit(dense).labels_, labels)
+    assert silhouette_score(dense, labels) == pytest.approx(silhouette_score(features, labels))
@@ -0,0 +1,35 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import memo
+import profiling
+from seed_sweep import seed_sweep
+
+
+@pytest.fixture
+def profiled():
+    profiling.enable()
+    yield
+    profiling.disable()
+
+
+def test_pooled_run_reports_each_section_once(profiled):
+    data = np.random.default_rng(0).random((300, 6))
+    columns = [f"f{i}" for i in range(6)]
+    memo.clear()
+    # Records made before the pools start are inherited by forked workers, they must not come back from them
+    with profiling.section('prep', data):
+        pass
+    with profiling.section('sweep', data):
+        seed_sweep(data, columns, [0, 1], n_workers=2, silhouette_options={'mode': 'simplified'})
+
+    records = profiling.records()
+    counts = Counter(record['name'] for record in records)
+    assert counts['prep'] == 1
+    assert counts['sweep'] == 1
+    # One refit per (seed, column)
+    assert counts['permutation_fit'] == 2 * len(columns)
+    identities = Counter((record['name'], record['pid'], record['start_s']) for record in records)
+    assert max(identities.values()) == 1
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+import memo
+from seed_sweep import SeedStore, best_seed, pca_clustering, seed_sweep, selected_features
+
+SILHOUETTE = {'mode': 'simplified'}
+
+
+@pytest.fixture
+def survey():
+    rng = np.random.default_rng(0)
+    centers = rng.random((3, 6)) * 4
+    data = np.vstack([center + rng.normal(scale=0.3, size=(60, 6)) for center in centers])
+    return data, [f"f{i}" for i in range(6)]
+
+
+def expected_clustering(data, columns, results, seed):
+    features = selected_features(results[seed][0])
+    data_pca_3d, labels, _ = pca_clustering(data, columns, features, 3, SILHOUETTE)
+    return data_pca_3d, labels
+
+
+@pytest.mark.parametrize('batch_size', [1, 8])
+def test_best_clustering_is_returned(survey, batch_size):
+    data, columns = survey
+    memo.clear()
+    results, (seed, data_pca_3d, labels) = seed_sweep(data, columns, range(3), n_workers=1, batch_size=batch_size,
+                                                      silhouette_options=SILHOUETTE)
+    assert seed == best_seed(results)
+    memo.clear()
+    expected_pca, expected_labels = expected_clustering(data, columns, results, seed)
+    np.testing.assert_allclose(data_pca_3d, expected_pca)
+    np.testing.assert_array_equal(labels, expected_labels)
+
+
+def test_resumed_sweep_returns_the_same_clustering(survey, tmp_path):
+    data, columns = survey
+    store = SeedStore(str(tmp_path), data, {'n_clusters': 3})
+    memo.clear()
+    results, (seed, data_pca_3d, labels) = seed_sweep(data, columns, range(3), n_workers=1, batch_size=1,
+                                                      store=store, silhouette_options=SILHOUETTE)
+    # Every seed comes from the store: the best clustering is computed from its features
+    memo.clear()
+    resumed, (resumed_seed, resumed_pca, resumed_labels) = seed_sweep(data, columns, range(3), n_workers=1,
+                                                                      store=store, silhouette_options=SILHOUETTE)
+    assert resumed_seed == seed
+    assert {s: score for s, (_, score) in resumed.items()} == {s: score for s, (_, score) in results.items()}
+    np.testing.assert_allclose(resumed_pca, data_pca_3d)
+    np.testing.assert_array_equal(resumed_labels, labels)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_preparation_encoding import max_words, process_and_align_text, stop_words
+from text_features import NGRAM_RANGE, TEXT_MODES, HashingTfidf
+
+PREFIX = 'MH_TFIDF_'
+
+
+def own_text(respondent):
+    # Words no other respondent uses, so every n-gram of a row belongs to exactly one respondent
+    return ' '.join(f"{word}{respondent}" for word in ('alpha', 'bravo', 'charlie', 'delta', 'echo'))
+
+
+@pytest.fixture
+def survey():
+    # A non-default, unsorted index, with respondents whose text is filtered out in the middle of it
+    index = [105, 7, 42, 300, 11, 64, 2, 58]
+    texts = {105: own_text(105), 7: "no response", 42: own_text(42), 300: "i dont know", 11: own_text(11),
+             64: ' '.join(['word'] * (max_words + 1)), 2: own_text(2), 58: own_text(58)}
+    return pd.DataFrame({'text': [texts[respondent] for respondent in index], 'age': range(len(index))},
+                        index=index)
+
+
+def kept(survey):
+    return [position for position, text in enumerate(survey['text']) if text.startswith('alpha')]
+
+
+def ngram_buckets(text, n_features):
+    # Hash buckets of the n-grams of one text on its own
+    return set(HashingTfidf(stop_words(), n_features=n_features).hasher.transform([text]).indices)
+
+
+@pytest.mark.parametrize('mode', TEXT_MODES)
+def test_one_row_per_respondent(survey, mode):
+    tfidf, _ = process_and_align_text(survey['text'], PREFIX, survey, stop_words(), mode=mode, n_features=2 ** 10)
+    assert tfidf.shape[0] == len(survey)
+
+
+@pytest.mark.parametrize('mode', TEXT_MODES)
+def test_filtered_respondents_get_empty_rows(survey, mode):
+    tfidf, _ = process_and_align_text(survey['text'], PREFIX, survey, stop_words(), mode=mode, n_features=2 ** 10)
+    for position in set(range(len(survey))) - set(kept(survey)):
+        assert tfidf[position].nnz == 0
+
+
+def test_vocabulary_rows_match_own_text(survey):
+    tfidf, names = process_and_align_text(survey['text'], PREFIX, survey, stop_words(), mode='vocabulary')
+    for position in kept(survey):
+        respondent = survey.index[position]
+        words = own_text(respondent).split()
+        ngrams = {PREFIX + ' '.join(words[start:start + n]) for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1)
+                  for start in range(len(words) - n + 1)}
+        assert {names[col] for col in tfidf[position].indices} == ngrams
+
+
+def test_hashing_rows_match_own_text(survey):
+    n_features = 2 ** 18
+    tfidf, names = process_and_align_text(survey['text'], PREFIX, survey, stop_words(), mode='hashing',
+                                          n_features=n_features, chunk_size=2)
+    assert names is None
+    for position in kept(survey):
+        assert set(tfidf[position].indices) == ngram_buckets(survey['text'].iloc[position], n_features)
+
+
+@pytest.mark.parametrize('mode', TEXT_MODES)
+def test_rows_follow_the_respondents_not_the_order(survey, mode):
+    # Shuffling the respondents shuffles their rows along with them
+    tfidf, names = process_and_align_text(survey['text'], PREFIX, survey, stop_words(), mode=mode,
+                                          n_features=2 ** 18)
+    shuffled = survey.iloc[np.random.default_rng(0).permutation(len(survey))]
+    shuffled_tfidf, shuffled_names = process_and_align_text(shuffled['text'], PREFIX, shuffled, stop_words(),
+                                                            mode=mode, n_features=2 ** 18)
+    assert names == shuffled_names
+    for position, respondent in enumerate(shuffled.index):
+        original = survey.index.get_loc(respondent)
+        np.testing.assert_allclose(shuffled_tfidf[position].toarray(), tfidf[original].toarray())
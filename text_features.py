@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from lazy import lazy_import
+
+# The text vectorizers are only needed when the text features are computed
+text = lazy_import('sklearn.feature_extraction.text')
+
+# Words and n-grams of the interview free-text features
+TOKEN_PATTERN = r'(?u)\b\w[\w-]+\b'
+NGRAM_RANGE = (3, 4)
+TEXT_MODES = ('vocabulary', 'hashing')
+
+
+def vocabulary_tfidf(texts, prefix, stop_words):
+    """
+    TF-IDF with a fitted n-gram vocabulary, so every column is a readable n-gram.
+
+    Returns:
+    tuple: (scipy.sparse.csr_matrix, list of column names '<prefix><n-gram>').
+    """
+    vectorizer = text.TfidfVectorizer(
+        lowercase=False,
+        stop_words=sorted(stop_words),
+        token_pattern=TOKEN_PATTERN,
+        # max_df=0.95,
+        # min_df=0.005,
+        ngram_range=NGRAM_RANGE
+    )
+    tfidf = vectorizer.fit_transform(texts)
+    return tfidf, [f"{prefix}{feat}" for feat in vectorizer.get_feature_names_out()]
+
+
+class HashingTfidf:
+    """
+    Streaming TF-IDF over hashed n-grams with a fixed number of columns.
+
+    The n-grams are hashed into n_features buckets instead of being stored in a vocabulary, and the document
+    frequencies are accumulated chunk by chunk with partial_fit(), so memory does not grow with the amount of
+    text. The weighting matches TfidfVectorizer (smoothed idf, l2-normalized rows) up to hash collisions.
+    Columns are bucket numbers and cannot be mapped back to n-grams.
+
+    Parameters:
+    stop_words (iterable): Words removed before building the n-grams.
+    n_features (int): Number of hash buckets (columns).
+    """
+
+    def __init__(self, stop_words, n_features=2 ** 18):
+        self.n_features = n_features
+        self.hasher = text.HashingVectorizer(
+            n_features=n_features,
+            alternate_sign=False,
+            norm=None,
+            lowercase=False,
+            stop_words=sorted(stop_words),
+            token_pattern=TOKEN_PATTERN,
+            ngram_range=NGRAM_RANGE
+        )
+        self.document_frequency_ = np.zeros(n_features, dtype=np.int64)
+        self.n_documents_ = 0
+
+    def partial_fit(self, texts):
+        # Counts every bucket once per document it occurs in
+        counts = self.hasher.transform(texts)
+        self.document_frequency_ += np.bincount(counts.indices, minlength=self.n_features)
+        self.n_documents_ += counts.shape[0]
+        return self
+
+    @property
+    def idf_(self):
+        return np.log((1 + self.n_documents_) / (1 + self.document_frequency_)) + 1
+
+    def transform(self, texts):
+        tfidf = self.hasher.transform(texts).astype(np.float64)
+        tfidf.data *= self.idf_[tfidf.indices]
+        return normalize(tfidf, copy=False)
+
+    def transform_chunks(self, texts, chunk_size=10_000):
+        # Sparse blocks of chunk_size rows, in order
+        for start in range(0, len(texts), chunk_size):
+            yield self.transform(texts[start:start + chunk_size])
+
+
+def hashing_tfidf(texts, stop_words, n_features=2 ** 18, chunk_size=10_000):
+    """
+    TF-IDF of texts through HashingTfidf, reading the texts in chunks twice: once for the document
+    frequencies, once for the weighted blocks.
+
+    Returns:
+    scipy.sparse.csr_matrix: (len(texts), n_features) matrix.
+    """
+    model = HashingTfidf(stop_words, n_features=n_features)
+    for start in range(0, len(texts), chunk_size):
+        model.partial_fit(texts[start:start + chunk_size])
+    blocks = list(model.transform_chunks(texts, chunk_size))
+    if not blocks:
+        return sp.csr_matrix((0, n_features))
+    return sp.vstack(blocks, format='csr')
+
+
+def top_features(matrix, names, prefix, top_n=20):
+    """
+    The top_n columns by mean value, e.g. for plotting the most important n-grams.
+    Hashed columns (names is None) are named '<prefix>hash_<bucket>'.
+
+    Returns:
+    pd.Series: Mean value of the top columns, indexed by name, sorted descending.
+    """
+    means = np.asarray(matrix.mean(axis=0)).ravel()
+    top = np.argsort(-means, kind='stable')[:top_n]
+    index = [names[i] if names is not None else f"{prefix}hash_{i}" for i in top]
+    return pd.Series(means[top], index=index)